@@ -0,0 +1,5 @@
+from src.batch import main
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+import re
+
+from src.chart import DrumChart, DRUMS_HEADERS
+from src.mapping import CHNoteKind, CH_NOTE_LANES, DrumsDifficulty, DRUMS_REDUCTIONS
+
+
+# Sections of a .chart file, and the note rows in them
+_SECTION = re.compile(r"^\[(\w+)\]\n\{\n(.*?)^\}", re.MULTILINE | re.DOTALL)
+_NOTE_ROW = re.compile(r"^\s*(\d+) = N (\d+) \d+$", re.MULTILINE)
+
+
+def _section_notes(notes_chart: str) -> dict[str,dict[int,list[int]]]:
+    # Section header -> tick -> CH notes
+    sections: dict[str,dict[int,list[int]]] = {}
+    for header, body in _SECTION.findall(notes_chart):
+        notes: dict[int,list[int]] = {}
+        for tick, ch_note in _NOTE_ROW.findall(body):
+            notes.setdefault(int(tick), []).append(int(ch_note))
+        sections[header] = notes
+    return sections
+
+
+def _hit_lanes(ch_notes: list[int]) -> set[int]:
+    # Lanes that the CH notes hit (0 for the kick), without the markers
+    return {CH_NOTE_LANES[ch_note][0] for ch_note in ch_notes if CH_NOTE_LANES[ch_note][1] == CHNoteKind.HIT}
+
+
+def find_missing_downbeats(chart: DrumChart) -> dict[str,int]:
+    # Number of master bar downbeats of which each lower difficulty drops the kick,
+    # or more of the hand lanes than it keeps per tick
+    tempo_map = chart.tempo_map
+    downbeats = tempo_map.sub_ticks_array_to_ticks(tempo_map.master_bar_start_ticks).tolist()
+    sections = _section_notes(chart.render_notes_chart())
+    expert_notes = sections[DRUMS_HEADERS[DrumsDifficulty.EXPERT]]
+    expert_lanes = [(tick, _hit_lanes(expert_notes.get(tick, []))) for tick in downbeats]
+
+    missing: dict[str,int] = {}
+    for difficulty, reduction in DRUMS_REDUCTIONS.items():
+        notes = sections[DRUMS_HEADERS[difficulty]]
+        missing[DRUMS_HEADERS[difficulty]] = 0
+        for tick, lanes in expert_lanes:
+            kept_lanes = _hit_lanes(notes.get(tick, []))
+            num_hand_lanes = min(len(lanes - {0}), reduction.max_hand_lanes)
+            if (0 in lanes and 0 not in kept_lanes) or len(kept_lanes - {0}) < num_hand_lanes:
+                missing[DRUMS_HEADERS[difficulty]] += 1
+    return missing
@@ -0,0 +1,55 @@
+import json
+import statistics
+import subprocess
+import sys
+from typing import Any
+
+from pathlib import Path
+
+
+# Modules that only the stages using them may import
+HEAVY_MODULES = ("torch", "demucs", "pydub", "PIL")
+
+# Entry points of the converter
+ENTRY_MODULES = ("src.core", "src.batch")
+
+# Imports a module in a fresh interpreter and prints how long it took and what got imported
+_IMPORT_SCRIPT = """
+import json, sys, time
+start_time = time.perf_counter()
+import {module}
+import_time = time.perf_counter() - start_time
+print(json.dumps({{"time": import_time, "modules": sorted(sys.modules)}}))
+"""
+
+REPOSITORY_DIR = Path(__file__).resolve().parent.parent
+
+
+def measure_import(module: str, repeat: int = 5) -> dict[str,Any]:
+    times: list[float] = []
+    heavy_modules: set[str] = set()
+    for _ in range(max(1, repeat)):
+        process = subprocess.run(
+            [sys.executable, "-c", _IMPORT_SCRIPT.format(module=module)],
+            cwd=REPOSITORY_DIR,
+            capture_output=True,
+            text=True,
+            check=True
+        )
+        result = json.loads(process.stdout.splitlines()[-1])
+        times.append(result["time"])
+        heavy_modules.update(
+            heavy_module
+            for heavy_module in HEAVY_MODULES
+            if heavy_module in result["modules"]
+        )
+
+    return {
+        "time_min": min(times),
+        "time_median": statistics.median(times),
+        "heavy_modules": sorted(heavy_modules),
+    }
+
+
+def measure_imports(repeat: int = 5) -> dict[str,dict[str,Any]]:
+    return {f"import {module}": measure_import(module, repeat) for module in ENTRY_MODULES}
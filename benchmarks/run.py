@@ -0,0 +1,280 @@
+import argparse
+import io
+import json
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import contextmanager
+from dataclasses import asdict
+from typing import Any, Callable, Iterator
+
+from pathlib import Path
+
+import numpy as np
+
+from src.const import CHART_RESOLUTIONS, INI_FILENAME, NOTES_FILENAME, DefaultValues
+from src.gp import parse_gpif
+from src.chart import DrumChart
+
+from .synthetic import SyntheticScoreOptions, generate_gpif
+from .imports import measure_imports
+from .checks import find_missing_downbeats
+
+
+# DrumChart methods that are timed as stages of their own, in the order they run
+CHART_STAGES = (
+    "_retrieve_song_data",
+    "_retrieve_tempo_data",
+    "_retrieve_track_data",
+    "_retrieve_master_bar_data",
+    "_retrieve_tick_scale",
+    "_create_master_bar_timeline",
+    "_create_sync_track_data",
+    "_create_events_data",
+    "_create_expert_drums_data",
+    "_create_lower_drums_data",
+)
+PARSE_STAGE = "parse_gpif"
+WRITER_STAGES = ("write_ini_file", "write_notes_chart_file")
+
+# Slowdowns of less than this many seconds are timer noise, whatever their ratio
+MIN_REGRESSION_TIME = 0.0001
+
+
+# Collects the wall time and peak traced memory of every stage of one run
+class _StageRecorder:
+    def __init__(self, trace_memory: bool) -> None:
+        self._trace_memory = trace_memory
+        self.times: dict[str,float] = {}                            # stage -> seconds
+        self.peak_memory: dict[str,int] = {}                        # stage -> bytes
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        if self._trace_memory:
+            tracemalloc.reset_peak()
+            start_memory = tracemalloc.get_traced_memory()[0]
+        start_time = time.perf_counter()
+        yield
+        self.times[name] = self.times.get(name, 0.0) + time.perf_counter() - start_time
+        if self._trace_memory:
+            peak_memory = tracemalloc.get_traced_memory()[1] - start_memory
+            self.peak_memory[name] = max(self.peak_memory.get(name, 0), peak_memory)
+
+
+def _timed_method(name: str, method: Callable[..., Any]) -> Callable[..., Any]:
+    def timed(self: "_BenchmarkDrumChart", *args: Any, **kwargs: Any) -> Any:
+        with self.recorder.stage(name):
+            return method(self, *args, **kwargs)
+    return timed
+
+
+# DrumChart that reports each of its stages to a recorder
+class _BenchmarkDrumChart(DrumChart):
+    recorder: _StageRecorder
+
+for _name in CHART_STAGES + WRITER_STAGES:
+    setattr(_BenchmarkDrumChart, _name, _timed_method(_name, getattr(DrumChart, _name)))
+
+
+def _run_once(gpif: bytes, resolution: int, out_folder: Path, trace_memory: bool) -> _StageRecorder:
+    recorder = _StageRecorder(trace_memory)
+    _BenchmarkDrumChart.recorder = recorder
+
+    with recorder.stage(PARSE_STAGE):
+        score = parse_gpif(io.BytesIO(gpif))
+    chart = _BenchmarkDrumChart(score, resolution=resolution)
+    chart.write_ini_file(out_folder / INI_FILENAME)
+    chart.write_notes_chart_file(out_folder / NOTES_FILENAME)
+    return recorder
+
+
+def run_benchmark(
+    options: SyntheticScoreOptions,
+    resolution: int = DefaultValues.SONG_RESOLUTION,
+    repeat: int = 5
+) -> dict[str,Any]:
+    gpif = generate_gpif(options)
+    stages = (PARSE_STAGE,) + CHART_STAGES + WRITER_STAGES
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        # Time the stages without tracing the memory, which slows them down
+        runs = [_run_once(gpif, resolution, Path(tmp_dir), trace_memory=False) for _ in range(max(1, repeat))]
+
+        # Measure the peak memory of every stage in a separate run
+        tracemalloc.start()
+        try:
+            memory_run = _run_once(gpif, resolution, Path(tmp_dir), trace_memory=True)
+        finally:
+            tracemalloc.stop()
+
+    stage_results: dict[str,dict[str,float|int]] = {}
+    for stage in stages:
+        times = [run.times.get(stage, 0.0) for run in runs]
+        stage_results[stage] = {
+            "time_min": min(times),
+            "time_median": statistics.median(times),
+            "peak_memory": memory_run.peak_memory.get(stage, 0),
+        }
+    totals = [sum(run.times.values()) for run in runs]
+
+    # Check the lower difficulties in an untimed run
+    chart = DrumChart(parse_gpif(io.BytesIO(gpif)), resolution=resolution)
+
+    return {
+        "options": asdict(options),
+        "resolution": resolution,
+        "repeat": len(runs),
+        "gpif_size": len(gpif),
+        "environment": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+        },
+        "stages": stage_results,
+        "total": {"time_min": min(totals), "time_median": statistics.median(totals)},
+        "imports": measure_imports(repeat),
+        "missing_downbeats": find_missing_downbeats(chart),
+    }
+
+
+def compare_to_baseline(results: dict[str,Any], baseline: dict[str,Any], tolerance: float) -> list[str]:
+    # Stages (and the total) whose fastest time grew by more than the tolerance (and the noise)
+    regressions: list[str] = []
+    entries = {**results["stages"], "total": results["total"], **results["imports"]}
+    baseline_entries = {
+        **baseline.get("stages", {}),
+        "total": baseline.get("total", {}),
+        **baseline.get("imports", {})
+    }
+    for name, entry in entries.items():
+        baseline_time = baseline_entries.get(name, {}).get("time_min")
+        if not baseline_time: continue
+        ratio = entry["time_min"] / baseline_time
+        print(f"{name:<30} {baseline_time * 1000:9.2f} ms -> {entry['time_min'] * 1000:9.2f} ms ({ratio:5.2f}x)", file=sys.stderr)
+        if ratio > 1 + tolerance and entry["time_min"] - baseline_time > MIN_REGRESSION_TIME:
+            regressions.append(name)
+    return regressions
+
+
+def main() -> None:
+    defaults = SyntheticScoreOptions()
+    parser = argparse.ArgumentParser(description="Benchmark the conversion stages on a synthetic Guitar Pro score.")
+    parser.add_argument(
+        "--tracks",
+        type=int,
+        default=defaults.num_tracks,
+        help="Number of tracks (the first one is the drum kit)."
+    )
+    parser.add_argument(
+        "--master-bars",
+        type=int,
+        default=defaults.num_master_bars,
+        help="Number of master bars."
+    )
+    parser.add_argument(
+        "--notes-per-beat",
+        type=int,
+        default=defaults.notes_per_beat,
+        help="Number of notes of every beat that is not a rest."
+    )
+    parser.add_argument(
+        "--tempo-changes",
+        type=int,
+        default=defaults.num_tempo_changes,
+        help="Number of tempo automations after the first one."
+    )
+    parser.add_argument(
+        "--tuplets",
+        type=float,
+        default=defaults.tuplet_ratio,
+        help="Share of the quarter notes played as triplets."
+    )
+    parser.add_argument(
+        "--grace-notes",
+        type=float,
+        default=defaults.grace_note_ratio,
+        help="Share of the drum beats preceded by a grace note."
+    )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=defaults.seed,
+        help="Seed of the generated score."
+    )
+    parser.add_argument(
+        "-r",
+        "--resolution",
+        type=int,
+        choices=CHART_RESOLUTIONS,
+        default=DefaultValues.SONG_RESOLUTION,
+        help="Resolution of the chart in ticks per quarter note."
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=5,
+        help="Number of timed runs."
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        type=str,
+        required=False,
+        help="Path of the JSON results file (stdout if not specified)."
+    )
+    parser.add_argument(
+        "--baseline",
+        type=str,
+        required=False,
+        help="Path of a JSON results file to compare against."
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.2,
+        help="Allowed slowdown compared to the baseline before failing (0.2 = 20%%)."
+    )
+    args = parser.parse_args()
+
+    # Run the benchmark
+    options = SyntheticScoreOptions(
+        num_tracks=max(1, int(args.tracks)),
+        num_master_bars=max(1, int(args.master_bars)),
+        notes_per_beat=max(1, int(args.notes_per_beat)),
+        num_tempo_changes=max(0, int(args.tempo_changes)),
+        tuplet_ratio=float(args.tuplets),
+        grace_note_ratio=float(args.grace_notes),
+        seed=int(args.seed)
+    )
+    results = run_benchmark(options, resolution=int(args.resolution), repeat=int(args.repeat))
+
+    # Write the results
+    results_text = json.dumps(results, indent=2)
+    if args.output:
+        Path(args.output).write_text(results_text + "\n")
+    else:
+        print(results_text)
+
+    # The entry points must not import the modules of the audio and image stages
+    for name, entry in results["imports"].items():
+        if entry["heavy_modules"]:
+            print(f"{name} imports {', '.join(entry['heavy_modules'])}", file=sys.stderr)
+            sys.exit(1)
+
+    # Every lower difficulty must keep the downbeats of the master bars
+    missing_downbeats = {header: count for header, count in results["missing_downbeats"].items() if count}
+    if missing_downbeats:
+        for header, count in missing_downbeats.items():
+            print(f"{header} drops {count} downbeats", file=sys.stderr)
+        sys.exit(1)
+
+    # Compare them to the baseline
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text())
+        regressions = compare_to_baseline(results, baseline, float(args.tolerance))
+        if regressions:
+            print(f"Slower than the baseline: {', '.join(regressions)}", file=sys.stderr)
+            sys.exit(1)
@@ -0,0 +1,188 @@
+import random
+from dataclasses import dataclass
+from xml.sax.saxutils import escape
+
+from src.const import GP_DRUM_KIT_TYPE
+
+
+# Drum kit midi notes that are mapped to CH notes
+DRUM_MIDI_NOTES = (35, 36, 37, 38, 40, 41, 42, 43, 44, 45, 46, 47, 48, 49, 50, 51, 52, 53, 55, 57, 91, 92, 93)
+
+# Time signatures that the master bars cycle through
+TIME_SIGNATURES = ((4, 4), (3, 4), (6, 8), (7, 8))
+
+# Length of the generated rhythms in 64th notes
+RHYTHM_LENGTHS = {
+    "Quarter": 16,
+    "Eighth":  8,
+    "16th":    4,
+}
+
+
+@dataclass
+class SyntheticScoreOptions:
+    num_tracks: int = 3                 # drum track + other instruments
+    num_master_bars: int = 200
+    notes_per_beat: int = 2             # notes of every beat that is not a rest
+    num_tempo_changes: int = 10
+    tuplet_ratio: float = 0.1           # share of the quarter notes played as triplet eighths
+    grace_note_ratio: float = 0.05      # share of the beats preceded by a grace note
+    seed: int = 0
+
+
+# Writes the elements of a GPIF document in the order Guitar Pro does,
+# giving every bar, voice, beat, note and rhythm the next free id
+class _GPIFWriter:
+    def __init__(self, options: SyntheticScoreOptions) -> None:
+        self._options = options
+        self._random = random.Random(options.seed)
+        self._bars: list[str] = []
+        self._voices: list[str] = []
+        self._beats: list[str] = []
+        self._notes: list[str] = []
+        self._rhythm_ids: dict[tuple[str,bool],int] = {}             # (note value, triplet) -> rhythm id
+
+    def write(self) -> bytes:
+        options = self._options
+        parts = ['<?xml version="1.0" encoding="utf-8"?>', "<GPIF>"]
+        parts.append(
+            "<Score><Title>Synthetic Song</Title><Artist>gp2ch</Artist>"
+            "<Album>Benchmarks</Album><Tabber>gp2ch</Tabber></Score>"
+        )
+
+        # Tempo automations, spread over the song
+        track_ids = " ".join(str(track_id) for track_id in range(options.num_tracks))
+        parts.append(f"<MasterTrack><Tracks>{track_ids}</Tracks><Automations>")
+        parts.append(self._tempo_automation(0, "0", 120))
+        for i in range(options.num_tempo_changes):
+            bar = (i + 1) * options.num_master_bars // (options.num_tempo_changes + 1)
+            position = self._random.choice(("0", "0.5"))
+            parts.append(self._tempo_automation(bar, position, self._random.randint(60, 220)))
+        parts.append("</Automations></MasterTrack>")
+        parts.append(
+            "<AudioTracks><AudioTrack><EmbeddedFilePath>Content/Assets/audio.mp3</EmbeddedFilePath>"
+            "</AudioTrack></AudioTracks>"
+        )
+
+        # Tracks (the first one is the drum kit)
+        parts.append("<Tracks>")
+        for track_id in range(options.num_tracks):
+            track_type = GP_DRUM_KIT_TYPE if track_id == 0 else ("electricGuitar", "electricBass")[track_id % 2]
+            parts.append(
+                f'<Track id="{track_id}"><Name>Track {track_id}</Name>'
+                f"<InstrumentSet><Type>{track_type}</Type></InstrumentSet>"
+                f"<Staves><Staff><Properties/></Staff></Staves></Track>"
+            )
+        parts.append("</Tracks>")
+
+        # Master bars, with a bar per track
+        parts.append("<MasterBars>")
+        for master_bar in range(options.num_master_bars):
+            numer, denom = TIME_SIGNATURES[master_bar // 8 % len(TIME_SIGNATURES)]
+            bar_ids = " ".join(
+                str(self._bar(numer * 64 // denom, is_drum_track=track_id == 0))
+                for track_id in range(options.num_tracks)
+            )
+            section = ""
+            if master_bar % 8 == 0:
+                section = f"<Section><Letter>A</Letter><Text>{escape(f'Part {master_bar // 8 + 1}')}</Text></Section>"
+            parts.append(f"<MasterBar><Time>{numer}/{denom}</Time>{section}<Bars>{bar_ids}</Bars></MasterBar>")
+        parts.append("</MasterBars>")
+
+        # Bars, voices, beats, notes and rhythms
+        for container, elements in (
+            ("Bars", self._bars),
+            ("Voices", self._voices),
+            ("Beats", self._beats),
+            ("Notes", self._notes),
+            ("Rhythms", self._rhythms()),
+        ):
+            parts.append(f"<{container}>")
+            parts.extend(elements)
+            parts.append(f"</{container}>")
+
+        parts.append("</GPIF>")
+        return "\n".join(parts).encode()
+
+    def _tempo_automation(self, bar: int, position: str, bpm: int) -> str:
+        return (
+            f"<Automation><Type>Tempo</Type><Linear>false</Linear><Bar>{bar}</Bar>"
+            f"<Position>{position}</Position><Value>{bpm} 2</Value></Automation>"
+        )
+
+    def _bar(self, length: int, is_drum_track: bool) -> int:
+        # Fill the bar with beats, in 64th notes
+        beat_ids: list[int] = []
+        remaining = length
+        while remaining > 0:
+            # Triplet eighths in place of a quarter note
+            if remaining >= RHYTHM_LENGTHS["Quarter"] and self._random.random() < self._options.tuplet_ratio:
+                for _ in range(3):
+                    beat_ids.extend(self._beat("Eighth", True, is_drum_track))
+                remaining -= RHYTHM_LENGTHS["Quarter"]
+                continue
+
+            note_value = self._random.choice([
+                value for value, value_length in RHYTHM_LENGTHS.items() if value_length <= remaining
+            ])
+            beat_ids.extend(self._beat(note_value, False, is_drum_track))
+            remaining -= RHYTHM_LENGTHS[note_value]
+
+        voice_id = len(self._voices)
+        self._voices.append(f'<Voice id="{voice_id}"><Beats>{" ".join(map(str, beat_ids))}</Beats></Voice>')
+        bar_id = len(self._bars)
+        self._bars.append(f'<Bar id="{bar_id}"><Clef>Neutral</Clef><Voices>{voice_id} -1 -1 -1</Voices></Bar>')
+        return bar_id
+
+    def _beat(self, note_value: str, triplet: bool, is_drum_track: bool) -> list[int]:
+        beat_ids: list[int] = []
+
+        # Grace note before the beat
+        if is_drum_track and self._random.random() < self._options.grace_note_ratio:
+            grace_note_type = self._random.choice(("BeforeBeat", "OnBeat"))
+            beat_ids.append(self._add_beat(
+                "32nd", False, [self._note(38)],
+                f"<GraceNotes>{grace_note_type}</GraceNotes>"
+            ))
+
+        # Notes (none for rests)
+        note_ids: list[int] = []
+        if self._random.random() >= 0.1:
+            for _ in range(self._options.notes_per_beat):
+                midi = self._random.choice(DRUM_MIDI_NOTES) if is_drum_track else self._random.randint(40, 70)
+                note_ids.append(self._note(midi))
+        dynamic = self._random.choice(("", "", "", "PP", "P", "F", "FFF"))
+        dynamic_element = f"<Dynamic>{dynamic}</Dynamic>" if dynamic else ""
+        beat_ids.append(self._add_beat(note_value, triplet, note_ids, dynamic_element))
+        return beat_ids
+
+    def _add_beat(self, note_value: str, triplet: bool, note_ids: list[int], extra_elements: str) -> int:
+        beat_id = len(self._beats)
+        rhythm_id = self._rhythm_ids.setdefault((note_value, triplet), len(self._rhythm_ids))
+        notes_element = f'<Notes>{" ".join(map(str, note_ids))}</Notes>' if note_ids else ""
+        self._beats.append(
+            f'<Beat id="{beat_id}">{extra_elements}<Rhythm ref="{rhythm_id}"/>{notes_element}</Beat>'
+        )
+        return beat_id
+
+    def _note(self, midi: int) -> int:
+        note_id = len(self._notes)
+        accent = self._random.choice(("", "", "", "", "<Accent>4</Accent>", "<Accent>8</Accent>"))
+        anti_accent = "<AntiAccent>Normal</AntiAccent>" if self._random.random() < 0.1 else ""
+        tie = '<Tie origin="false" destination="true"/>' if self._random.random() < 0.02 else ""
+        self._notes.append(
+            f'<Note id="{note_id}">{tie}{accent}{anti_accent}'
+            f'<Properties><Property name="Midi"><Number>{midi}</Number></Property></Properties></Note>'
+        )
+        return note_id
+
+    def _rhythms(self) -> list[str]:
+        rhythms: list[str] = []
+        for (note_value, triplet), rhythm_id in self._rhythm_ids.items():
+            tuplet = '<PrimaryTuplet num="3" den="2"/>' if triplet else ""
+            rhythms.append(f'<Rhythm id="{rhythm_id}"><NoteValue>{note_value}</NoteValue>{tuplet}</Rhythm>')
+        return rhythms
+
+
+def generate_gpif(options: SyntheticScoreOptions) -> bytes:
+    return _GPIFWriter(options).write()
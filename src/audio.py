@@ -1,64 +1,589 @@
+from typing import IO, TYPE_CHECKING, Callable, Iterable, Iterator
+
 from pathlib import Path
 from enum import StrEnum
-import xml.etree.ElementTree as ET
+import hashlib
+import json
 import multiprocessing
+import shutil
+import subprocess
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import numpy as np
 
-from pydub import AudioSegment
-import demucs.api
-import demucs.audio
+from .const import (
+    COUNTDOWN_TIME, PCM_BLOCK_SIZE, FILE_BLOCK_SIZE, ENCODE_JOBS,
+    DEMUCS_MODEL, DEMUCS_DRUMS_MODEL, DEMUCS_PARAMETERS,
+    DEMUCS_MODEL_MEMORY, DEMUCS_MEMORY_PER_SAMPLE,
+    SEGMENT_OVERLAP_TIME, SEGMENT_MIN_TIME,
+    DefaultValues
+)
+from .gp import GPArchive
+from .cache import FileCache, hash_file_source
+from .profiling import Profiler, NO_PROFILER
+from .worker import SeparationClient, connect_separation_worker
 
-from .const import TMP_GP_DIR, TMP_AUDIO_DIR, COUNTDOWN_TIME
+# demucs (and torch) and pydub take long to import,
+# so they are only imported by the functions that use them
+if TYPE_CHECKING:
+    import demucs.api
 
 
 class AudioStem(StrEnum):
-    DRUMS  = "drums"
-    BASS   = "bass"
-    OTHER  = "other"
-    VOCALS = "vocals"
+    DRUMS    = "drums"
+    BASS     = "bass"
+    OTHER    = "other"
+    VOCALS   = "vocals"
+    NO_DRUMS = "no_drums"   # everything but the drums
 
+# Stems of a split into four stems and of a split of the drums from the rest
+FOUR_STEMS = (AudioStem.DRUMS, AudioStem.BASS, AudioStem.OTHER, AudioStem.VOCALS)
+DRUMS_STEMS = (AudioStem.DRUMS, AudioStem.NO_DRUMS)
 
-def extract_audio_filepath_from_gpif(root: ET.Element) -> Path | None:
-    # Try to find the embedded audio file path
-    audio_element = root.find(".//EmbeddedFilePath")
-    if audio_element is None:
-        return None
-    audio_path_text = audio_element.text
+AudioSource = Path | IO[bytes]
+
+
+def open_audio_file_from_gp(embedded_file_path: str | None, archive: GPArchive) -> IO[bytes] | None:
+    # Try to find the embedded audio file in the archive
+    audio_path_text = embedded_file_path
     if not audio_path_text:
         return None
-    audio_path = TMP_GP_DIR / audio_path_text
-    if not audio_path.exists() or not audio_path.is_file():
+    if not archive.has_member(audio_path_text):
         return None
-    return audio_path
+    return archive.open_member(audio_path_text)
+
+
+def open_audio_source(
+    audio_file: Path | None = None,
+    archive: GPArchive | None = None,
+    embedded_file_path: str | None = None
+) -> AudioSource | None:
+    # Use the audio file if it is valid,
+    # otherwise try to read the audio track from the GP archive
+    if audio_file is not None and audio_file.exists() and audio_file.is_file():
+        return audio_file
+    if archive is None:
+        return None
+    return open_audio_file_from_gp(embedded_file_path, archive)
+
+
+def write_audio_files(
+    folder: Path,
+    audio_file: Path | None = None,
+    archive: GPArchive | None = None,
+    embedded_file_path: str | None = None,
+    split: bool = False,
+    stem_cache: FileCache | None = None,
+    encode_jobs: int = ENCODE_JOBS,
+    max_memory: int | None = None,
+    profiler: Profiler = NO_PROFILER,
+    drums_only: bool = False
+) -> None:
+    # If no (valid) audio file is provided,
+    # try to read the audio track from the GP archive
+    audio_source = open_audio_source(audio_file, archive, embedded_file_path)
+    if audio_source is None:
+        raise FileNotFoundError(
+            "Error: No audio file found in the Guitar Pro file and no valid audio file specified."
+        )
+
+    try:
+        # Split the track if requested
+        # and convert the audio tracks to OGG files
+        if split:
+            stem_filenames: dict[AudioStem,Path] = {}
+            for stem in DRUMS_STEMS if drums_only else FOUR_STEMS:
+                match stem:
+                    case AudioStem.DRUMS:
+                        filename = folder / DefaultValues.SONG_DRUMS_STREAM
+                    case AudioStem.BASS:
+                        filename = folder / DefaultValues.SONG_BASS_STREAM
+                    case AudioStem.OTHER:
+                        filename = folder / DefaultValues.SONG_GUITAR_STREAM
+                    case AudioStem.VOCALS:
+                        filename = folder / DefaultValues.SONG_VOCALS_STREAM
+                    case AudioStem.NO_DRUMS:
+                        filename = folder / DefaultValues.SONG_MUSIC_STREAM
+                stem_filenames[stem] = filename
+            write_split_audio_files(
+                audio_source,
+                stem_filenames,
+                stem_cache=stem_cache,
+                encode_jobs=encode_jobs,
+                max_memory=max_memory,
+                profiler=profiler
+            )
+        else:
+            filename = folder / DefaultValues.SONG_MUSIC_STREAM
+            with profiler.stage("audio.encode"):
+                export_audio_to_ogg(audio_source, filename)
+    finally:
+        # Close the audio file if it was opened from the archive
+        if not isinstance(audio_source, Path):
+            audio_source.close()
 
 
-def split_audio_track(audio_file: Path) -> dict[AudioStem,Path]:
+def write_split_audio_files(
+    audio_source: AudioSource,
+    out_filepaths: dict[AudioStem,Path],
+    stem_cache: FileCache | None = None,
+    encode_jobs: int = ENCODE_JOBS,
+    max_memory: int | None = None,
+    profiler: Profiler = NO_PROFILER
+) -> None:
+    # Reuse the stems of an earlier separation of the same audio
+    cache_key = None
+    if stem_cache is not None:
+        with profiler.stage("audio.stem_cache"):
+            cache_key = _stem_cache_key(audio_source, max_memory, _separation_model(out_filepaths))
+            cached_files = stem_cache.get(cache_key)
+            if cached_files is not None and all(stem in cached_files for stem in out_filepaths):
+                for stem, out_filepath in out_filepaths.items():
+                    out_filepath.parent.mkdir(parents=True, exist_ok=True)
+                    shutil.copyfile(cached_files[stem], out_filepath)
+                profiler.count("audio.stem_cache_hits")
+                return
+        profiler.count("audio.stem_cache_misses")
+
+    if max_memory is None:
+        # Separate the stems and encode them straight from memory,
+        # running one encoder per stem at the same time
+        with profiler.stage("audio.separate"):
+            stems, samplerate = split_audio_track(audio_source, tuple(out_filepaths))
+        with profiler.stage("audio.encode"):
+            _encode_stems(
+                lambda stem, out_filepath: export_samples_to_ogg(stems[stem], samplerate, out_filepath),
+                out_filepaths,
+                encode_jobs
+            )
+    else:
+        # Separate the stems segment by segment
+        with profiler.stage("audio.separate_and_encode"):
+            split_audio_track_segmented(audio_source, out_filepaths, max_memory, encode_jobs)
+
+    # Keep the encoded stems for later conversions of the same audio
+    if stem_cache is not None and cache_key is not None:
+        stem_cache.put(cache_key, dict(out_filepaths), copy=True)
+
+
+def split_audio_track(
+    audio_source: AudioSource,
+    stems: tuple[AudioStem,...] = FOUR_STEMS
+) -> tuple[dict[AudioStem,np.ndarray],int]:
+    model = _separation_model(stems)
+
+    # Let a running separation worker separate the stems, with its model already loaded
+    client = connect_separation_worker(model)
+    if client is not None:
+        try:
+            with client:
+                wav = _decode_audio(audio_source, client.samplerate, client.audio_channels)
+                separated = client.separate(wav)
+            return _select_stems(separated, wav, stems), client.samplerate
+        except (OSError, EOFError):
+            # The worker stopped, so separate the stems here
+            if not isinstance(audio_source, Path):
+                audio_source.seek(0)
+
+    import torch
+
     # Separate the stems
+    separator = create_separator(model)
+    if isinstance(audio_source, Path):
+        origin, separated = separator.separate_audio_file(audio_source)
+    else:
+        wav = _decode_audio(audio_source, separator.samplerate, separator.audio_channels)
+        origin, separated = separator.separate_tensor(torch.from_numpy(wav), separator.samplerate)
+
+    # Return the (channels, samples) waveform of each stem
+    separated = {stem: stem_wav.cpu().numpy() for stem, stem_wav in separated.items()}
+    return _select_stems(separated, origin.cpu().numpy(), stems), separator.samplerate
+
+
+def split_audio_track_segmented(
+    audio_source: AudioSource,
+    out_filepaths: dict[AudioStem,Path],
+    max_memory: int,
+    encode_jobs: int = ENCODE_JOBS
+) -> None:
+    model = _separation_model(out_filepaths)
+
+    # Let a running separation worker separate the segments, with its model already loaded
+    client = connect_separation_worker(model)
+    if client is not None:
+        try:
+            with client:
+                _split_audio_track_segmented(audio_source, out_filepaths, max_memory, encode_jobs, client)
+            return
+        except (OSError, EOFError):
+            # The worker stopped, so separate the segments here,
+            # from the start of the audio and without the output of the first attempt
+            if not isinstance(audio_source, Path):
+                if not audio_source.seekable(): raise
+                audio_source.seek(0)
+            for out_filepath in out_filepaths.values():
+                out_filepath.unlink(missing_ok=True)
+
+    _split_audio_track_segmented(audio_source, out_filepaths, max_memory, encode_jobs, create_separator(model))
+
+
+def _split_audio_track_segmented(
+    audio_source: AudioSource,
+    out_filepaths: dict[AudioStem,Path],
+    max_memory: int,
+    encode_jobs: int,
+    separator: "demucs.api.Separator | SeparationClient"
+) -> None:
+    samplerate = separator.samplerate
+    num_channels = separator.audio_channels
+
+    # Pick the longest segment that fits in the memory budget
+    segment_frames = (max_memory - DEMUCS_MODEL_MEMORY) // (num_channels * DEMUCS_MEMORY_PER_SAMPLE)
+    if segment_frames < SEGMENT_MIN_TIME * samplerate:
+        raise ValueError(f"Error: a memory budget of {max_memory // 1024**2} MB is too low to split the audio.")
+    overlap_frames = SEGMENT_OVERLAP_TIME * samplerate
+    segment_frames -= overlap_frames
+
+    # Spool every stem to disk until its peak is known
+    spools = {
+        stem: _PCMSpool(num_channels, out_filepath.parent)
+        for stem, out_filepath in out_filepaths.items()
+    }
+    blocks = _decode_audio_blocks(audio_source, samplerate, num_channels, segment_frames)
+    try:
+        context: np.ndarray | None = None                           # end of the previous segment
+        tails: dict[AudioStem,np.ndarray] = {}                      # stems of the end of the previous segment
+        for block in blocks:
+            # Separate the segment together with the end of the previous one
+            segment = block if context is None else np.concatenate((context, block), axis=1)
+            separated = _select_stems(_separate_segment(separator, segment), segment, tuple(out_filepaths))
+
+            # Hold back the end of this segment until the next one is separated
+            keep_frames = min(overlap_frames, block.shape[1])
+            context = segment[:, segment.shape[1] - keep_frames:]
+            for stem, spool in spools.items():
+                stem_audio = separated[stem]
+
+                # Crossfade the overlapping part with the previous segment
+                tail = tails.get(stem, None)
+                if tail is not None:
+                    fade = np.linspace(0, 1, tail.shape[1], dtype=np.float32)
+                    spool.write(tail * (1 - fade) + stem_audio[:, :tail.shape[1]] * fade)
+                    stem_audio = stem_audio[:, tail.shape[1]:]
+
+                # Flush the finished part of the segment
+                spool.write(stem_audio[:, :stem_audio.shape[1] - keep_frames])
+                tails[stem] = stem_audio[:, stem_audio.shape[1] - keep_frames:]
+
+        # Flush the end of the last segment
+        for stem, tail in tails.items():
+            spools[stem].write(tail)
+
+        # Encode the stems with the same scaling as whole stems
+        _encode_stems(
+            lambda stem, out_filepath: spools[stem].export_to_ogg(samplerate, out_filepath),
+            out_filepaths,
+            encode_jobs
+        )
+    finally:
+        # Stop the decoder (and its feeder) before the audio source is read again
+        blocks.close()
+        for spool in spools.values():
+            spool.close()
+
+
+def export_audio_to_ogg(audio_source: AudioSource, out_filepath: Path) -> None:
+    # Let the encoder decode the audio file, add the silence and encode it
+    # block by block, so that memory use does not depend on the length
+    countdown_filter = f"adelay=delays={COUNTDOWN_TIME * 1000}:all=1"
+    if isinstance(audio_source, Path):
+        _encode_to_ogg(["-i", str(audio_source), "-af", countdown_filter], out_filepath)
+    else:
+        # Stream the file to the encoder, which buffers it on disk if it needs to seek
+        _encode_to_ogg(
+            ["-read_ahead_limit", "-1", "-i", "cache:pipe:0", "-af", countdown_filter],
+            out_filepath,
+            write_input=lambda stdin: shutil.copyfileobj(audio_source, stdin, FILE_BLOCK_SIZE)
+        )
+
+
+def export_samples_to_ogg(samples: np.ndarray, samplerate: int, out_filepath: Path) -> None:
+    # Scale the waveform down if it would clip
+    num_channels, num_frames = samples.shape
+    scale = _peak_scale(float(np.abs(samples).max()) if num_frames else 0.0)
+
+    # Pipe the countdown silence and the samples to the encoder as raw PCM
+    encoder = _PCMEncoder(samplerate, num_channels, out_filepath)
+    try:
+        encoder.write(samples, scale=scale)
+    finally:
+        encoder.close()
+
+
+def _peak_scale(peak: float) -> float:
+    # Scale that keeps the waveform from clipping
+    return 1 / max(1.01 * peak, 1)
+
+
+def _encode_stems(
+    export: Callable[[AudioStem,Path],None],
+    out_filepaths: dict[AudioStem,Path],
+    encode_jobs: int
+) -> None:
+    # Run one encoder per stem at the same time
+    errors: dict[AudioStem,Exception] = {}
+    with ThreadPoolExecutor(max_workers=max(1, min(encode_jobs, len(out_filepaths)))) as executor:
+        futures = {
+            executor.submit(export, stem, out_filepath): stem
+            for stem, out_filepath in out_filepaths.items()
+        }
+        for future in as_completed(futures):
+            error = future.exception()
+            if error is not None:
+                errors[futures[future]] = error
+    _raise_stem_errors(errors, out_filepaths)
+
+
+# Raw PCM waveform written to a temporary file as it becomes available,
+# so that it can be scaled by its peak once it is complete
+class _PCMSpool:
+    def __init__(self, num_channels: int, folder: Path) -> None:
+        self._num_channels = num_channels
+        folder.mkdir(parents=True, exist_ok=True)
+        self._file = tempfile.TemporaryFile(dir=folder)
+        self._peak = 0.0
+
+    def write(self, samples: np.ndarray) -> None:
+        if samples.shape[1] == 0: return
+        self._peak = max(self._peak, float(np.abs(samples).max()))
+        self._file.write(samples.T.astype(np.float32).tobytes())
+
+    def export_to_ogg(self, samplerate: int, out_filepath: Path) -> None:
+        # Read the waveform back block by block
+        scale = _peak_scale(self._peak)
+        block_size = PCM_BLOCK_SIZE * self._num_channels * np.dtype(np.float32).itemsize
+        self._file.seek(0)
+        encoder = _PCMEncoder(samplerate, self._num_channels, out_filepath)
+        try:
+            while True:
+                data = self._file.read(block_size)
+                if not data: break
+                encoder.write(np.frombuffer(data, dtype=np.float32).reshape(-1, self._num_channels).T, scale=scale)
+        finally:
+            encoder.close()
+
+    def close(self) -> None:
+        self._file.close()
+
+
+# Encoder that is fed (channels, samples) waveforms as they become available,
+# starting with the countdown silence
+class _PCMEncoder:
+    def __init__(self, samplerate: int, num_channels: int, out_filepath: Path) -> None:
+        self._out_filepath = out_filepath
+        self._process = _start_encoder(
+            ["-f", "f32le", "-ar", str(samplerate), "-ac", str(num_channels), "-i", "pipe:0"],
+            out_filepath,
+            pipe_input=True
+        )
+        self._broken = False
+        self.write(np.zeros((num_channels, COUNTDOWN_TIME * samplerate), dtype=np.float32))
+
+    def write(self, samples: np.ndarray, scale: float = 1.0) -> None:
+        if self._broken or self._process.stdin is None: return
+        try:
+            for start in range(0, samples.shape[1], PCM_BLOCK_SIZE):
+                block = samples[:, start:start + PCM_BLOCK_SIZE].T
+                if scale != 1.0:
+                    block = block * scale
+                self._process.stdin.write(block.astype(np.float32).tobytes())
+        except BrokenPipeError:
+            # The encoder stopped, its error is reported when it is closed
+            self._broken = True
+
+    def close(self) -> None:
+        _finish_encoder(self._process, self._out_filepath)
+
+
+def _encode_to_ogg(
+    input_arguments: list[str],
+    out_filepath: Path,
+    write_input: Callable[[IO[bytes]], None] | None = None
+) -> None:
+    # Run the encoder, feeding it through stdin if needed
+    process = _start_encoder(input_arguments, out_filepath, pipe_input=write_input is not None)
+    if write_input is not None and process.stdin is not None:
+        try:
+            write_input(process.stdin)
+        except BrokenPipeError:
+            pass
+    _finish_encoder(process, out_filepath)
+
+
+def _start_encoder(input_arguments: list[str], out_filepath: Path, pipe_input: bool) -> subprocess.Popen:
+    out_filepath.parent.mkdir(parents=True, exist_ok=True)
+    return subprocess.Popen(
+        [
+            _ffmpeg_path(), "-y", "-loglevel", "error",
+            *input_arguments,
+            "-vn", "-f", "ogg", str(out_filepath)
+        ],
+        stdin=subprocess.PIPE if pipe_input else subprocess.DEVNULL,
+        stderr=subprocess.PIPE
+    )
+
+
+def _finish_encoder(process: subprocess.Popen, out_filepath: Path) -> None:
+    _, stderr = process.communicate()
+    if process.returncode != 0:
+        raise RuntimeError(f"Error: could not encode {out_filepath}: {stderr.decode(errors='replace')}")
+
+
+def _ffmpeg_path() -> str:
+    # ffmpeg as found by pydub
+    from pydub import AudioSegment
+    return AudioSegment.converter
+
+
+def _raise_stem_errors(errors: dict[AudioStem,Exception], out_filepaths: dict[AudioStem,Path]) -> None:
+    if not errors: return
+    messages = "; ".join(f"{stem}: {errors[stem]}" for stem in out_filepaths if stem in errors)
+    raise RuntimeError(f"Error: could not encode {len(errors)} stem(s) ({messages}).")
+
+
+def _separate_segment(
+    separator: "demucs.api.Separator | SeparationClient",
+    segment: np.ndarray
+) -> dict[str,np.ndarray]:
+    if isinstance(separator, SeparationClient):
+        return separator.separate(segment)
+
+    import torch
+
+    _, separated = separator.separate_tensor(torch.from_numpy(segment), separator.samplerate)
+    return {stem: stem_wav.cpu().numpy() for stem, stem_wav in separated.items()}
+
+
+def _separation_model(stems: Iterable[AudioStem]) -> str:
+    # The drums model alone is enough to split the drums from the rest
+    return DEMUCS_DRUMS_MODEL if set(stems) <= set(DRUMS_STEMS) else DEMUCS_MODEL
+
+
+def _select_stems(
+    separated: dict[str,np.ndarray],
+    mix: np.ndarray,
+    stems: tuple[AudioStem,...]
+) -> dict[AudioStem,np.ndarray]:
+    # Everything but the drums is what is left of the mix without them
+    return {
+        stem: mix - separated[AudioStem.DRUMS] if stem == AudioStem.NO_DRUMS else separated[stem]
+        for stem in stems
+    }
+
+
+def create_separator(model: str = DEMUCS_MODEL) -> "demucs.api.Separator":
+    import demucs.api
+
     ncores = multiprocessing.cpu_count() - 1
-    separator = demucs.api.Separator(
-        model="htdemucs_ft",
+    return demucs.api.Separator(
+        model=model,
+        **DEMUCS_PARAMETERS,
         jobs=ncores,
         progress=True
     )
-    _, separated = separator.separate_audio_file(audio_file)
 
-    # Create temporary audio files for each stem
-    filenames: dict[AudioStem,Path] = {}
-    TMP_AUDIO_DIR.mkdir(parents=True, exist_ok=True)
-    for stem in AudioStem:
-        stem_audio = separated[stem]
-        stem_file  = TMP_AUDIO_DIR / f"{stem}.wav"
-        demucs.audio.save_audio(stem_audio, stem_file,  separator.samplerate)
-        filenames[stem] = stem_file
 
-    return filenames
+def _stem_cache_key(
+    audio_source: AudioSource,
+    max_memory: int | None = None,
+    model: str = DEMUCS_MODEL
+) -> str:
+    # Hash the audio data
+    audio_digest = hash_file_source(audio_source)
 
+    # Combine it with the separation and encoding settings
+    # (segmented separation gives slightly different stems)
+    settings = json.dumps(
+        {
+            "model": model, **DEMUCS_PARAMETERS,
+            "max_memory": max_memory,
+            "countdown": COUNTDOWN_TIME, "format": "ogg"
+        },
+        sort_keys=True
+    )
+    return hashlib.sha256(f"{audio_digest}:{settings}".encode()).hexdigest()
 
-def export_audio_to_ogg(filepath: Path, out_filepath: Path) -> None:
-    # Load the audio file and add silence
-    audio: AudioSegment = AudioSegment.from_file(filepath)
-    countdown_silence = AudioSegment.silent(duration=COUNTDOWN_TIME * 1000)
-    audio: AudioSegment = countdown_silence + audio
 
-    # Export the audio file to OGG format
-    out_filepath.parent.mkdir(parents=True, exist_ok=True)
-    audio.export(out_filepath, format="ogg")
+def _decode_audio(audio_source: AudioSource, samplerate: int, num_channels: int) -> np.ndarray:
+    # Decode the whole audio file to a (channels, samples) waveform
+    blocks = list(_decode_audio_blocks(audio_source, samplerate, num_channels, PCM_BLOCK_SIZE))
+    if not blocks:
+        return np.zeros((num_channels, 0), dtype=np.float32)
+    return np.concatenate(blocks, axis=1)
+
+
+def _decode_audio_blocks(
+    audio_source: AudioSource,
+    samplerate: int,
+    num_channels: int,
+    block_frames: int
+) -> Iterator[np.ndarray]:
+    # Let the decoder convert the audio file to raw PCM
+    if isinstance(audio_source, Path):
+        input_arguments = ["-i", str(audio_source)]
+    else:
+        input_arguments = ["-read_ahead_limit", "-1", "-i", "cache:pipe:0"]
+    process = subprocess.Popen(
+        [
+            _ffmpeg_path(), "-loglevel", "error",
+            *input_arguments,
+            "-vn", "-f", "f32le", "-ar", str(samplerate), "-ac", str(num_channels), "pipe:1"
+        ],
+        stdin=subprocess.DEVNULL if isinstance(audio_source, Path) else subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE
+    )
+
+    # Feed the file to the decoder from another thread while reading its output
+    feeder = None
+    if not isinstance(audio_source, Path):
+        feeder = threading.Thread(target=_feed_process, args=(audio_source, process), daemon=True)
+        feeder.start()
+
+    # Read the waveform block by block
+    finished = False
+    try:
+        if process.stdout is None: return
+        block_size = block_frames * num_channels * np.dtype(np.float32).itemsize
+        while True:
+            data = process.stdout.read(block_size)
+            if not data: break
+            frames = np.frombuffer(data, dtype=np.float32)
+            frames = frames[:len(frames) - len(frames) % num_channels]
+            yield frames.reshape(-1, num_channels).T.copy()
+        finished = True
+    finally:
+        # Stop the decoder if the waveform was not read until the end
+        if not finished:
+            process.kill()
+        if feeder is not None:
+            feeder.join()
+        stderr = process.stderr.read() if process.stderr is not None else b""
+        process.wait()
+    if process.returncode != 0:
+        raise RuntimeError(f"Error: could not decode the audio file: {stderr.decode(errors='replace')}")
+
+
+def _feed_process(audio_source: IO[bytes], process: subprocess.Popen) -> None:
+    if process.stdin is None: return
+    try:
+        shutil.copyfileobj(audio_source, process.stdin, FILE_BLOCK_SIZE)
+    except BrokenPipeError:
+        pass
+    finally:
+        try:
+            process.stdin.close()
+        except BrokenPipeError:
+            pass
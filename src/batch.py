@@ -0,0 +1,200 @@
+import argparse
+import glob
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from pathlib import Path
+
+from .const import CHART_RESOLUTIONS, SPLIT_JOBS, DefaultValues
+from .core import (
+    ConversionOptions, ConversionResult, convert,
+    add_split_argument, parse_split_argument,
+    add_stem_cache_arguments, parse_stem_cache_arguments,
+    add_conversion_cache_arguments, parse_conversion_cache_arguments
+)
+from .worker import connect_separation_worker
+
+
+def find_gp_files(inputs: list[str]) -> dict[Path,Path]:
+    # GP file -> its output folder, relative to the output folder of the batch
+    gp_files: dict[Path,Path] = {}
+    for input_text in inputs:
+        input_path = Path(input_text)
+        if input_path.is_dir():
+            # All .gp files in the directory and its subdirectories,
+            # keeping their place in it
+            for gp_file in sorted(input_path.rglob("*.gp")):
+                gp_files.setdefault(gp_file, gp_file.relative_to(input_path).with_suffix(""))
+        elif any(char in input_text for char in "*?["):
+            # All .gp files matching the glob pattern,
+            # keeping their place in the folder the pattern starts from
+            root = _glob_root(input_text)
+            for match in sorted(glob.glob(input_text, recursive=True)):
+                if not match.endswith(".gp"): continue
+                gp_file = Path(match)
+                gp_files.setdefault(gp_file, gp_file.relative_to(root).with_suffix(""))
+        else:
+            gp_files.setdefault(input_path, Path(input_path.stem))
+
+    # Songs of different inputs may still end up in the same folder
+    output_names: set[Path] = set()
+    for gp_file, output_name in gp_files.items():
+        unique_name = output_name
+        copy_number = 2
+        while unique_name in output_names:
+            unique_name = output_name.with_name(f"{output_name.name} ({copy_number})")
+            copy_number += 1
+        output_names.add(unique_name)
+        gp_files[gp_file] = unique_name
+    return gp_files
+
+
+def _glob_root(pattern: str) -> Path:
+    # Folder before the first part of the pattern with a wildcard
+    root = Path()
+    for part in Path(pattern).parts:
+        if any(char in part for char in "*?["): break
+        root /= part
+    return root
+
+
+def convert_batch(
+    gp_files: dict[Path,Path],
+    output_folder: Path,
+    split: bool = False,
+    drums_only: bool = False,
+    resolution: int = DefaultValues.SONG_RESOLUTION,
+    fret_tracks: bool = False,
+    jobs: int | None = None,
+    stem_cache_dir: Path | None = None,
+    stem_cache_size: int = 0,
+    max_memory: int | None = None,
+    conversion_cache_dir: Path | None = None,
+    conversion_cache_size: int = 0
+) -> dict[Path,ConversionResult|Exception]:
+    # Without a separation worker, every process that splits the audio loads its own separator,
+    # which already uses all cores
+    if split and jobs is None:
+        client = connect_separation_worker()
+        if client is None:
+            jobs = SPLIT_JOBS
+        else:
+            client.close()
+
+    # Convert every GP file to its folder (relative to the output folder) in a pool of processes
+    results: dict[Path,ConversionResult|Exception] = {}
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures = {
+            executor.submit(
+                convert,
+                gp_file,
+                ConversionOptions(
+                    output_folder / output_name,
+                    split=split,
+                    drums_only=drums_only,
+                    resolution=resolution,
+                    fret_tracks=fret_tracks,
+                    stem_cache_dir=stem_cache_dir,
+                    stem_cache_size=stem_cache_size,
+                    max_memory=max_memory,
+                    conversion_cache_dir=conversion_cache_dir,
+                    conversion_cache_size=conversion_cache_size
+                )
+            ): gp_file
+            for gp_file, output_name in gp_files.items()
+        }
+        for future in as_completed(futures):
+            gp_file = futures[future]
+            try:
+                result = future.result()
+            except Exception as error:
+                results[gp_file] = error
+                print(f"FAILED {gp_file}: {error}", file=sys.stderr)
+            else:
+                results[gp_file] = result
+                print(f"OK     {gp_file} -> {result.output_path}")
+
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "inputs",
+        type=str,
+        nargs="+",
+        help="Guitar Pro (.gp) files, folders containing them, or glob patterns."
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        type=str,
+        required=False,
+        default=str(DefaultValues.OUTPUT_DIR),
+        help="Path to the folder in which an output folder per song will be created."
+    )
+    add_split_argument(parser)
+    parser.add_argument(
+        "-r",
+        "--resolution",
+        type=int,
+        choices=CHART_RESOLUTIONS,
+        required=False,
+        default=DefaultValues.SONG_RESOLUTION,
+        help="Resolution of the charts in ticks per quarter note."
+    )
+    parser.add_argument(
+        "-g",
+        "--guitar-bass",
+        default=False,
+        action="store_true",
+        required=False,
+        help="If specified, also chart the first guitar and bass track of every song."
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        required=False,
+        help="Number of songs to convert at the same time. "
+             "Defaults to the number of cores, or to 1 when splitting without a separation worker."
+    )
+    add_stem_cache_arguments(parser)
+    add_conversion_cache_arguments(parser)
+    args = parser.parse_args()
+
+    # Parse the arguments
+    gp_files = find_gp_files(args.inputs)
+    output_folder = Path(args.output)
+    split, drums_only = parse_split_argument(args)
+    resolution = int(args.resolution)
+    fret_tracks = bool(args.guitar_bass)
+    jobs = max(1, int(args.jobs)) if args.jobs else None
+    stem_cache_dir, stem_cache_size, max_memory = parse_stem_cache_arguments(args)
+    conversion_cache_dir, conversion_cache_size = parse_conversion_cache_arguments(args)
+
+    # Convert the GP files
+    results = convert_batch(
+        gp_files,
+        output_folder,
+        split=split,
+        drums_only=drums_only,
+        resolution=resolution,
+        fret_tracks=fret_tracks,
+        jobs=jobs,
+        stem_cache_dir=stem_cache_dir,
+        stem_cache_size=stem_cache_size,
+        max_memory=max_memory,
+        conversion_cache_dir=conversion_cache_dir,
+        conversion_cache_size=conversion_cache_size
+    )
+
+    # Report the failed conversions
+    num_failed = sum(isinstance(result, Exception) for result in results.values())
+    print(f"Converted {len(results) - num_failed}/{len(results)} files.")
+    if num_failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
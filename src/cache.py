@@ -0,0 +1,102 @@
+import hashlib
+import os
+import shutil
+import uuid
+from typing import IO
+
+from pathlib import Path
+
+
+def hash_file_source(source: Path | bytes | IO[bytes]) -> str:
+    # Hash a file given as a path, its raw bytes or a binary file object
+    # (which is rewound afterwards)
+    if isinstance(source, Path):
+        with open(source, "rb") as file:
+            return hashlib.file_digest(file, "sha256").hexdigest()
+    if isinstance(source, bytes):
+        return hashlib.sha256(source).hexdigest()
+    digest = hashlib.file_digest(source, "sha256").hexdigest()
+    source.seek(0)
+    return digest
+
+
+# Persistent cache of named files (names may include subfolders), grouped in one folder per key,
+# that evicts the least recently used entries when it grows too large
+class FileCache:
+    def __init__(self, folder: Path, max_size: int) -> None:
+        self._folder = folder
+        self._max_size = max_size                                   # bytes
+
+    @property
+    def folder(self) -> Path:
+        return self._folder
+
+    def get(self, key: str) -> dict[str,Path] | None:
+        entry_folder = self._folder / key
+        if not entry_folder.is_dir():
+            return None
+
+        # Mark the entry as recently used
+        try:
+            os.utime(entry_folder)
+        except FileNotFoundError:
+            return None
+        return {
+            filepath.relative_to(entry_folder).as_posix(): filepath
+            for filepath in entry_folder.rglob("*")
+            if filepath.is_file()
+        }
+
+    def put(self, key: str, files: dict[str,Path], copy: bool = False) -> dict[str,Path]:
+        # Move (or copy) the files into a staging folder first,
+        # so that other processes never see a partial entry
+        self._folder.mkdir(parents=True, exist_ok=True)
+        staging_folder = self._folder / f".{key}.{uuid.uuid4().hex}"
+        staging_folder.mkdir()
+        for name, filepath in files.items():
+            (staging_folder / name).parent.mkdir(parents=True, exist_ok=True)
+            if copy:
+                shutil.copyfile(filepath, staging_folder / name)
+            else:
+                shutil.move(filepath, staging_folder / name)
+
+        # Replace an entry that is missing some of the files
+        entry = self.get(key)
+        if entry is not None and not files.keys() <= entry.keys():
+            shutil.rmtree(self._folder / key, ignore_errors=True)
+
+        # Publish the entry, unless another process already did
+        try:
+            os.rename(staging_folder, self._folder / key)
+        except OSError:
+            shutil.rmtree(staging_folder, ignore_errors=True)
+            if not (self._folder / key).is_dir():
+                raise
+        self._evict(keep=key)
+
+        entry = self.get(key)
+        if entry is None:
+            raise FileNotFoundError(f"Error: cache entry {key} disappeared from {self._folder}.")
+        return entry
+
+    def _evict(self, keep: str) -> None:
+        # Collect the size and last use of every entry
+        entries: list[tuple[float,int,Path]] = []
+        total_size = 0
+        for entry_folder in self._folder.iterdir():
+            if entry_folder.name.startswith(".") or not entry_folder.is_dir(): continue
+            try:
+                last_used = entry_folder.stat().st_mtime
+                size = sum(filepath.stat().st_size for filepath in entry_folder.rglob("*") if filepath.is_file())
+            except FileNotFoundError:
+                continue
+            entries.append((last_used, size, entry_folder))
+            total_size += size
+
+        # Remove the least recently used entries until the cache fits
+        entries.sort(key=lambda x: x[0])
+        for _, size, entry_folder in entries:
+            if total_size <= self._max_size: break
+            if entry_folder.name == keep: continue
+            shutil.rmtree(entry_folder, ignore_errors=True)
+            total_size -= size
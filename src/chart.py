@@ -1,37 +1,38 @@
+from typing import IO, Iterator
 from enum import StrEnum
 from pathlib import Path
-import xml.etree.ElementTree as ET
-from math import log2
+from math import log2, lcm
+from fractions import Fraction
 
-from PIL import Image
+import numpy as np
 
 from .const import (
-    GP_DRUM_KIT_TYPE,
-    GP_INVALID_VOICE,
-    GP_RHYTHM_DICT,
+    GP_DRUM_KIT_TYPE, GP_GUITAR_TYPE_KEYWORD, GP_BASS_TYPE_KEYWORD,
     GP_DEFAULT_DYNAMIC,
     COUNTDOWN_TIME,
     ALBUM_SIZE,
+    CHART_RESOLUTIONS,
     DefaultValues,
     SongData,
     SyncTrackPointType, SyncTrackPoint,
     TrackPointType, TrackPoint,
 )
 from .gp import (
-    Accent, AntiAccent, GraceNoteType, Note,
-    Dynamic, Beat
+    AntiAccent, GraceNoteType,
+    Dynamic, GRACE_NOTE_TYPES, ANTI_ACCENTS,
+    GPScore, IdLists
 )
 from .mapping import (
-    GPMidiNote, CHMidiNote,
-    CH_NOTE_TO_ACCENT, CH_NOTE_TO_GHOST,
-    DRUMS_GP_TO_CH_MAPPING
-)
-from .audio import (
-    AudioStem,
-    extract_audio_filepath_from_gpif,
-    split_audio_track,
-    export_audio_to_ogg
+    CHMidiNote, CHNoteKind,
+    fret_lanes,
+    DrumsDifficulty, DRUMS_REDUCTIONS, CH_NOTE_LANES,
+    DRUMS_ACCENT_LEVELS,
+    DRUMS_DYNAMIC_SOFTER, DRUMS_DYNAMIC_DEFAULT, DRUMS_DYNAMIC_LOUDER,
+    DRUMS_GP_TO_CH_TABLE,
+    drums_table_index
 )
+from .profiling import Profiler, NO_PROFILER
+from .tempo import TempoMap
 
 
 class IniHeader(StrEnum):
@@ -46,10 +47,23 @@ class IniSongEntry(StrEnum):
     PRO_DRUMS          = "pro_drums"
 
 class NotesHeader(StrEnum):
-    SONG         = "Song"
-    SYNC_TRACK   = "SyncTrack"
-    EVENTS       = "Events"
-    EXPERT_DRUMS = "ExpertDrums"
+    SONG               = "Song"
+    SYNC_TRACK         = "SyncTrack"
+    EVENTS             = "Events"
+    EXPERT_SINGLE      = "ExpertSingle"
+    EXPERT_DOUBLE_BASS = "ExpertDoubleBass"
+    EXPERT_DRUMS       = "ExpertDrums"
+    HARD_DRUMS         = "HardDrums"
+    MEDIUM_DRUMS       = "MediumDrums"
+    EASY_DRUMS         = "EasyDrums"
+
+# Section of every drums difficulty, in the order they are written
+DRUMS_HEADERS: dict[DrumsDifficulty,NotesHeader] = {
+    DrumsDifficulty.EXPERT: NotesHeader.EXPERT_DRUMS,
+    DrumsDifficulty.HARD:   NotesHeader.HARD_DRUMS,
+    DrumsDifficulty.MEDIUM: NotesHeader.MEDIUM_DRUMS,
+    DrumsDifficulty.EASY:   NotesHeader.EASY_DRUMS,
+}
 
 class NotesSongEntry(StrEnum):
     RESOLUTION    = "Resolution"
@@ -70,59 +84,138 @@ class NotesSongEntry(StrEnum):
     PREVIEW_END   = "PreviewEnd"
     MEDIA_TYPE    = "MediaType"
 
+# End of the .chart row of every CH note, after its tick
+_CH_NOTE_ROW_ENDS: dict[int,str] = {
+    ch_note: f" = {TrackPointType.NOTE} {int(ch_note)} 0\n"
+    for ch_note in CHMidiNote
+}
+
+# Lane and kind of every CH note, indexed by the CH note
+_CH_NOTE_LANE_TABLE = np.zeros(max(CHMidiNote) + 1, dtype=np.int64)
+_CH_NOTE_KIND_TABLE = np.zeros(max(CHMidiNote) + 1, dtype=np.int64)
+for _ch_note, (_lane, _kind) in CH_NOTE_LANES.items():
+    _CH_NOTE_LANE_TABLE[_ch_note] = _lane
+    _CH_NOTE_KIND_TABLE[_ch_note] = _kind
+_NUM_LANES = max(_CH_NOTE_LANE_TABLE) + 1
+
+# True for the entries of the drums table without CH notes
+_DRUMS_UNMAPPED_TABLE = np.array([ch_notes is None for ch_notes in DRUMS_GP_TO_CH_TABLE])
+
+# CH notes of every entry of the drums table, back to back
+_DRUMS_CH_NOTE_LISTS = IdLists(
+    np.cumsum([0] + [len(ch_notes or []) for ch_notes in DRUMS_GP_TO_CH_TABLE], dtype=np.int64),
+    np.array([int(ch_note) for ch_notes in DRUMS_GP_TO_CH_TABLE for ch_note in ch_notes or []], dtype=np.int64)
+)
+
 
 class DrumChart:
-    def __init__(self, root: ET.Element, split: bool = False) -> None:
-        self._root = root
+    def __init__(self,
+        score: GPScore,
+        split: bool = False,
+        resolution: int = DefaultValues.SONG_RESOLUTION,
+        profiler: Profiler = NO_PROFILER,
+        drum_track_id: int | None = None,
+        fret_tracks: bool = False,
+        drums_only: bool = False
+    ) -> None:
+        self._score = score
         self._split = split
+        self._drums_only = drums_only                                   # True if only the drums are split off
+        self._profiler = profiler
+
+        # Check the resolution
+        if resolution not in CHART_RESOLUTIONS:
+            raise ValueError(f"Invalid chart resolution ({resolution}).")
 
         # Calculate the starting tick (after the countdown silence)
-        res = DefaultValues.SONG_RESOLUTION
         bpm = DefaultValues.SONG_BPM
-        self.start_tick = (res * bpm/60) * COUNTDOWN_TIME
+        self.start_tick = resolution * bpm * COUNTDOWN_TIME // 60
 
         # Guitar Pro data
-        self._tempo_data: list[tuple[float,float]] = []                 # (master bar position, bpm)
-        self._drum_track_id: int = -1                                   # track id of the drum track
+        self._tempo_data: list[tuple[Fraction,float]] = []              # (master bar position, bpm)
+        self._drum_track_id: int = -1 if drum_track_id is None else drum_track_id
+                                                                        # track id of the drum track (-1 for the last one)
+        self._fret_tracks: bool = fret_tracks                           # True to also chart the guitar and bass tracks
+        self._guitar_track_id: int = -1                                 # track id of the guitar track (-1 if none)
+        self._bass_track_id: int = -1                                   # track id of the bass track (-1 if none)
         self._track_num_staves: dict[int,int] = {}                      # track id -> number of staves
-        self._rhythm_data: dict[int,float] = {}                         # rhythm id -> rhythm value
-        self._note_data: dict[int,Note] = {}                            # note id -> Note object
-        self._beat_data: dict[int,Beat] = {}                            # beat id -> Beat object
-        self._voice_data: dict[int,list[int]] = {}                      # voice id -> list of beat ids
-        self._bar_data: dict[int,list[int]] = {}                        # bar id -> list of voice ids
         self._drum_bar_ids: list[int] = []                              # list of bar ids that are part of the drum track,
                                                                         # with index corresponding to the master bar id
+        self._guitar_bar_ids: list[int] = []                            # same for the guitar track (-1 if missing)
+        self._bass_bar_ids: list[int] = []                              # same for the bass track (-1 if missing)
         self._has_anacrusis: bool = False                               # True if there is an anacrusis
         self._time_signature_data: list[tuple[int,int,int]] = []        # (master bar id, numerator, denominator)
         self._section_data: list[tuple[int,str]] = []                   # (master bar id, section name)
 
         # Chart data
-        self._resolution: int = -1
+        self._resolution: int = resolution
+        self._tick_scale: int = 1                                       # sub-ticks per tick, so that every rhythm
+                                                                        # and master bar is a whole amount of sub-ticks
+        self._rhythm_sub_ticks: np.ndarray = np.empty(0)                # length in sub-ticks of each rhythm id (-1 if unknown),
+                                                                        # with an extra last entry for rhythm id -1
         self._num_master_bars: int = -1
-        self._master_bar_start_ticks: list[float] = []                  # starting tick value of each master bar
-        self._master_bar_end_ticks: list[float] = []                    # ending tick value of each master bar
+        self._tempo_map: TempoMap | None = None                         # time signatures and tempos of the master bars
         self._song_data: SongData = {}                                  # song data string -> value
-        self._tick_tempo_data: list[tuple[float,float]] = []                          # (tick, bpm)
         self._sync_track_data: list[SyncTrackPoint] = []                # (tick, point type, data)
         self._events_data: list[tuple[int,str]] = []                    # (tick, event string)
         self._export_drums_data: list[TrackPoint] = []                  # (tick, point_type, data)
+        self._expert_notes: np.ndarray = np.empty(0)                    # expert CH notes, point after point
+        self._expert_note_ticks: np.ndarray = np.empty(0)               # tick of each expert CH note
+        self._expert_note_bar_ticks: np.ndarray = np.empty(0)           # same, from the start of its master bar
+        self._expert_note_points: np.ndarray = np.empty(0)              # index of its point in the export drums data
+        self._lower_drums_data: dict[DrumsDifficulty,list[TrackPoint]] = {}
+                                                                        # difficulty -> (tick, point_type, data)
+        self._guitar_data: list[TrackPoint] = []                        # (tick, point_type, (frets, sustain))
+        self._bass_data: list[TrackPoint] = []                          # (tick, point_type, (frets, sustain))
 
         # Load the Guitar Pro data
-        self._retrieve_song_data()
-        self._retrieve_tempo_data()
-        self._retrieve_track_data()
-        self._retrieve_rhythm_data()
-        self._retrieve_note_data()
-        self._retrieve_beat_data()
-        self._retrieve_voice_data()
-        self._retrieve_bar_data()
-        self._retrieve_master_bar_data()
+        with profiler.stage("chart.retrieve"):
+            self._retrieve_song_data()
+            self._retrieve_tempo_data()
+            self._retrieve_track_data()
+            self._retrieve_master_bar_data()
+            self._retrieve_tick_scale()
 
         # Create the chart data
-        self._create_sync_track_data()
-        self._create_events_data()
-        self._create_expert_drums_data()
-
+        with profiler.stage("chart.timeline"):
+            self._create_master_bar_timeline()
+        with profiler.stage("chart.sync_track"):
+            self._create_sync_track_data()
+        with profiler.stage("chart.events"):
+            self._create_events_data()
+
+        # Create the tracks
+        with profiler.stage("chart.expert_drums"):
+            self._create_expert_drums_data()
+        with profiler.stage("chart.lower_drums"):
+            self._create_lower_drums_data()
+        if self._guitar_track_id >= 0:
+            with profiler.stage("chart.expert_guitar"):
+                self._guitar_data = self._create_fret_data(self._guitar_bar_ids)
+        if self._bass_track_id >= 0:
+            with profiler.stage("chart.expert_bass"):
+                self._bass_data = self._create_fret_data(self._bass_bar_ids)
+
+
+    @property
+    def title(self) -> str:
+        return self._song_data[NotesSongEntry.TITLE]
+
+    @property
+    def artist(self) -> str:
+        return self._song_data[NotesSongEntry.ARTIST]
+
+    @property
+    def drum_track_id(self) -> int:
+        return self._drum_track_id
+
+    @property
+    def tempo_map(self) -> TempoMap:
+        return self._get_tempo_map()
+
+    @property
+    def embedded_file_path(self) -> str | None:
+        return self._score.embedded_file_path
 
     def write_ini_file(self, filepath: Path) -> None:
         filepath.parent.mkdir(parents=True, exist_ok=True)
@@ -135,759 +228,547 @@ class DrumChart:
             file.write(f"{IniSongEntry.FRETS} = {self._song_data[NotesSongEntry.CHARTER]}\n")
             file.write(f"{IniSongEntry.PRO_DRUMS} = True\n")
 
-    def write_notes_chart_file(self, filepath: Path) -> None:
-        filepath.parent.mkdir(parents=True, exist_ok=True)
-        with open(filepath, "w") as file:
-            # Song
-            file.write(f"[{NotesHeader.SONG}]\n")
-            file.write("{\n")
-            file.write(f"  {NotesSongEntry.RESOLUTION} = {self._song_data[NotesSongEntry.RESOLUTION]}\n")
-            file.write(f"  {NotesSongEntry.TITLE} = \"{self._song_data[NotesSongEntry.TITLE]}\"\n")
-            file.write(f"  {NotesSongEntry.ARTIST} = \"{self._song_data[NotesSongEntry.ARTIST]}\"\n")
-            file.write(f"  {NotesSongEntry.ALBUM} = \"{self._song_data[NotesSongEntry.ALBUM]}\"\n")
-            file.write(f"  {NotesSongEntry.CHARTER} = \"{self._song_data[NotesSongEntry.CHARTER]}\"\n")
-            file.write(f"  {NotesSongEntry.GENRE} = \"{DefaultValues.SONG_GENRE}\"\n")
-            if self._split:
-                file.write(f"  {NotesSongEntry.DRUM_STREAM} = \"{DefaultValues.SONG_DRUMS_STREAM}\"\n")
-                file.write(f"  {NotesSongEntry.BASS_STREAM} = \"{DefaultValues.SONG_BASS_STREAM}\"\n")
-                file.write(f"  {NotesSongEntry.GUITAR_STREAM} = \"{DefaultValues.SONG_GUITAR_STREAM}\"\n")
-                file.write(f"  {NotesSongEntry.VOCAL_STREAM} = \"{DefaultValues.SONG_VOCALS_STREAM}\"\n")
-            else:
-                file.write(f"  {NotesSongEntry.MUSIC_STREAM} = \"{DefaultValues.SONG_MUSIC_STREAM}\"\n")
-            file.write(f"  {NotesSongEntry.OFFSET} = {self._song_data[NotesSongEntry.OFFSET]}\n")
-            file.write(f"  {NotesSongEntry.PLAYER2} = {DefaultValues.SONG_PLAYER2}\n")
-            file.write(f"  {NotesSongEntry.DIFFICULTY} = {DefaultValues.SONG_DIFFICULTY}\n")
-            file.write(f"  {NotesSongEntry.PREVIEW_START} = {DefaultValues.SONG_PREVIEW_START}\n")
-            file.write(f"  {NotesSongEntry.PREVIEW_END} = {DefaultValues.SONG_PREVIEW_END}\n")
-            file.write(f"  {NotesSongEntry.MEDIA_TYPE} = \"{DefaultValues.SONG_MEDIA_TYPE}\"\n")
-            file.write("}\n")
-
-            # SyncTrack
-            file.write(f"[{NotesHeader.SYNC_TRACK}]\n")
-            file.write("{\n")
-            for tick, point_type, data in self._sync_track_data:
-                if point_type == SyncTrackPointType.TIME_SIGNATURE:
-                    file.write(f"  {tick} = {point_type} {data[0]} {data[1]}\n")
-                elif point_type == SyncTrackPointType.BPM:
-                    file.write(f"  {tick} = {point_type} {data}\n")
-            file.write("}\n")
-
-            # Events
-            file.write(f"[{NotesHeader.EVENTS}]\n")
-            file.write("{\n")
-            for tick, event_text in self._events_data:
-                file.write(f"  {tick} = E \"{event_text}\"\n")
-            file.write("}\n")
-
-            # ExpertDrums
-            file.write(f"[{NotesHeader.EXPERT_DRUMS}]\n")
-            file.write("{\n")
-            for tick, point_type, data in self._export_drums_data:
-                if point_type == TrackPointType.NOTE:
-                    for ch_note in data:
-                        file.write(f"  {tick} = {point_type} {ch_note} 0\n")
-                elif point_type == TrackPointType.STAR_POWER:
-                    file.write(f"  {tick} = {point_type} {data[0]} {data[1]}\n")
-                elif point_type == TrackPointType.EVENT:
-                    file.write(f"  {tick} = {point_type} [{data}]\n")
-            file.write("}\n")
-
-    def write_audio_files(self, folder: Path, audio_file: Path | None = None) -> None:
-        # If no (valid) audio file is provided,
-        # try to extract an audio track from the GP archive
-        if audio_file is None or not audio_file.exists() or not audio_file.is_file():
-            audio_file = extract_audio_filepath_from_gpif(self._root)
-            if audio_file is None or not audio_file.exists() or not audio_file.is_file():
-                raise FileNotFoundError(
-                    "Error: No audio file found in the Guitar Pro file and no valid audio file specified."
-                )
-
-        # Split the track if requested
-        # and convert the audio tracks to OGG files
-        if self._split:
-            stem_files = split_audio_track(audio_file)
-            for stem in stem_files:
-                stem_file = stem_files[stem]
-                match stem:
-                    case AudioStem.DRUMS:
-                        filename = folder / DefaultValues.SONG_DRUMS_STREAM
-                    case AudioStem.BASS:
-                        filename = folder / DefaultValues.SONG_BASS_STREAM
-                    case AudioStem.OTHER:
-                        filename = folder / DefaultValues.SONG_GUITAR_STREAM
-                    case AudioStem.VOCALS:
-                        filename = folder / DefaultValues.SONG_VOCALS_STREAM
-                export_audio_to_ogg(stem_file, filename)
+    def write_notes_chart_file(self, file: Path | IO[str]) -> None:
+        # Write to a file object as is
+        if not isinstance(file, Path):
+            self.write_notes_chart(file)
+            return
+
+        file.parent.mkdir(parents=True, exist_ok=True)
+        with open(file, "w") as file_object:
+            self.write_notes_chart(file_object)
+
+    def write_notes_chart(self, file: IO[str]) -> None:
+        # One write per section
+        for section in self._render_notes_chart_sections():
+            file.write(section)
+
+    def render_notes_chart(self) -> str:
+        return "".join(self._render_notes_chart_sections())
+
+    def _render_notes_chart_sections(self) -> Iterator[str]:
+        yield self._render_song_section()
+        yield self._render_sync_track_section()
+        yield self._render_events_section()
+        if self._guitar_track_id >= 0:
+            yield self._render_fret_section(NotesHeader.EXPERT_SINGLE, self._guitar_data)
+        if self._bass_track_id >= 0:
+            yield self._render_fret_section(NotesHeader.EXPERT_DOUBLE_BASS, self._bass_data)
+        yield self._render_drums_section(DRUMS_HEADERS[DrumsDifficulty.EXPERT], self._export_drums_data)
+        for difficulty, drums_data in self._lower_drums_data.items():
+            yield self._render_drums_section(DRUMS_HEADERS[difficulty], drums_data)
+
+    def _render_section(self, header: NotesHeader, rows: list[str]) -> str:
+        return f"[{header}]\n{{\n{''.join(rows)}}}\n"
+
+    def _render_song_section(self) -> str:
+        song_data = self._song_data
+        rows = [
+            f"  {NotesSongEntry.RESOLUTION} = {song_data[NotesSongEntry.RESOLUTION]}\n",
+            f"  {NotesSongEntry.TITLE} = \"{song_data[NotesSongEntry.TITLE]}\"\n",
+            f"  {NotesSongEntry.ARTIST} = \"{song_data[NotesSongEntry.ARTIST]}\"\n",
+            f"  {NotesSongEntry.ALBUM} = \"{song_data[NotesSongEntry.ALBUM]}\"\n",
+            f"  {NotesSongEntry.CHARTER} = \"{song_data[NotesSongEntry.CHARTER]}\"\n",
+            f"  {NotesSongEntry.GENRE} = \"{DefaultValues.SONG_GENRE}\"\n",
+        ]
+        if self._split and self._drums_only:
+            rows += [
+                f"  {NotesSongEntry.MUSIC_STREAM} = \"{DefaultValues.SONG_MUSIC_STREAM}\"\n",
+                f"  {NotesSongEntry.DRUM_STREAM} = \"{DefaultValues.SONG_DRUMS_STREAM}\"\n",
+            ]
+        elif self._split:
+            rows += [
+                f"  {NotesSongEntry.DRUM_STREAM} = \"{DefaultValues.SONG_DRUMS_STREAM}\"\n",
+                f"  {NotesSongEntry.BASS_STREAM} = \"{DefaultValues.SONG_BASS_STREAM}\"\n",
+                f"  {NotesSongEntry.GUITAR_STREAM} = \"{DefaultValues.SONG_GUITAR_STREAM}\"\n",
+                f"  {NotesSongEntry.VOCAL_STREAM} = \"{DefaultValues.SONG_VOCALS_STREAM}\"\n",
+            ]
         else:
-            filename = folder / DefaultValues.SONG_MUSIC_STREAM
-            export_audio_to_ogg(audio_file, filename)
-
-
-    def write_album_image_file(self,
-        filepath: Path,
-        image_file: Path
-    ) -> None:
-        image = Image.open(image_file)
-        image = image.resize(ALBUM_SIZE)
-        image.save(filepath, format="png")
+            rows.append(f"  {NotesSongEntry.MUSIC_STREAM} = \"{DefaultValues.SONG_MUSIC_STREAM}\"\n")
+        rows += [
+            f"  {NotesSongEntry.OFFSET} = {song_data[NotesSongEntry.OFFSET]}\n",
+            f"  {NotesSongEntry.PLAYER2} = {DefaultValues.SONG_PLAYER2}\n",
+            f"  {NotesSongEntry.DIFFICULTY} = {DefaultValues.SONG_DIFFICULTY}\n",
+            f"  {NotesSongEntry.PREVIEW_START} = {DefaultValues.SONG_PREVIEW_START}\n",
+            f"  {NotesSongEntry.PREVIEW_END} = {DefaultValues.SONG_PREVIEW_END}\n",
+            f"  {NotesSongEntry.MEDIA_TYPE} = \"{DefaultValues.SONG_MEDIA_TYPE}\"\n",
+        ]
+        return self._render_section(NotesHeader.SONG, rows)
+
+    def _render_sync_track_section(self) -> str:
+        # Format the point types once
+        time_signature = str(SyncTrackPointType.TIME_SIGNATURE)
+        bpm = str(SyncTrackPointType.BPM)
+
+        rows: list[str] = []
+        for tick, point_type, data in self._sync_track_data:
+            if point_type == SyncTrackPointType.TIME_SIGNATURE:
+                rows.append(f"  {tick} = {time_signature} {data[0]} {data[1]}\n")
+            elif point_type == SyncTrackPointType.BPM:
+                rows.append(f"  {tick} = {bpm} {data}\n")
+        return self._render_section(NotesHeader.SYNC_TRACK, rows)
+
+    def _render_events_section(self) -> str:
+        rows = [f"  {tick} = E \"{event_text}\"\n" for tick, event_text in self._events_data]
+        return self._render_section(NotesHeader.EVENTS, rows)
+
+    def _render_drums_section(self, header: NotesHeader, drums_data: list[TrackPoint]) -> str:
+        # Format the point types once
+        star_power = str(TrackPointType.STAR_POWER)
+        event = str(TrackPointType.EVENT)
+
+        rows: list[str] = []
+        for tick, point_type, data in drums_data:
+            if point_type == TrackPointType.NOTE:
+                tick_text = f"  {tick}"
+                rows.extend([tick_text + _CH_NOTE_ROW_ENDS[ch_note] for ch_note in data])
+            elif point_type == TrackPointType.STAR_POWER:
+                rows.append(f"  {tick} = {star_power} {data[0]} {data[1]}\n")
+            elif point_type == TrackPointType.EVENT:
+                rows.append(f"  {tick} = {event} [{data}]\n")
+        return self._render_section(header, rows)
+
+    def _render_fret_section(self, header: NotesHeader, fret_data: list[TrackPoint]) -> str:
+        note = str(TrackPointType.NOTE)
+
+        rows: list[str] = []
+        for tick, point_type, data in fret_data:
+            if point_type == TrackPointType.NOTE:
+                frets, sustain = data
+                rows.extend([f"  {tick} = {note} {int(fret)} {sustain}\n" for fret in frets])
+        return self._render_section(header, rows)
 
 
     def _retrieve_song_data(self) -> None:
-        # Title
-        title_element = self._root.find("Score/Title")
-        title = ""
-        if title_element is not None and title_element.text:
-            title = title_element.text
-
-        # Artist
-        artist_element = self._root.find("Score/Artist")
-        artist = ""
-        if artist_element is not None and artist_element.text:
-            artist = artist_element.text
-
-        # Album
-        album_element = self._root.find("Score/Album")
-        album = ""
-        if album_element is not None and album_element.text:
-            album = album_element.text
-
-        # Charter
-        charter_element = self._root.find("Score/Tabber")
-        charter = ""
-        if charter_element is not None and charter_element.text:
-            charter = charter_element.text
-
-        # Resolution
-        self._resolution = int(DefaultValues.SONG_RESOLUTION)
-
         # Set the song data
         self._song_data = {
             NotesSongEntry.RESOLUTION: self._resolution,
-            NotesSongEntry.TITLE:      title,
-            NotesSongEntry.ARTIST:     artist,
-            NotesSongEntry.ALBUM:      album,
-            NotesSongEntry.CHARTER:    charter,
+            NotesSongEntry.TITLE:      self._score.title,
+            NotesSongEntry.ARTIST:     self._score.artist,
+            NotesSongEntry.ALBUM:      self._score.album,
+            NotesSongEntry.CHARTER:    self._score.charter,
             NotesSongEntry.OFFSET:     int(DefaultValues.SONG_OFFSET),
         }
 
     def _retrieve_tempo_data(self) -> None:
-        # Inspired by https://github.com/lmeullibre/gp-metronome-extractor
-        for automation in self._root.findall(".//Automation[Type='Tempo']"):
-            # Get the bar number
-            bar_element = automation.find("Bar")
-            if bar_element is None: continue
-            bar_text = bar_element.text
-            if bar_text is None: continue
-            bar = int(bar_text)
-
-            # Get the position in the bar
-            position_element = automation.find("Position")
-            if position_element is None: continue
-            position_text = position_element.text
-            if position_text is None: continue
-            position = float(position_text)
-
-            # Get the tempo value
-            value_element = automation.find("Value")
-            if value_element is None: continue
-            value_text = value_element.text
-            if value_text is None: continue
-            tempo_value = value_text.split()[0]
-            bpm = float(tempo_value)
-
-            # Append the tempo to the list
-            self._tempo_data.append((bar + position, bpm))
-
         # Sort the tempos by bar and position
-        self._tempo_data.sort(key=lambda x: (x[0], x[1]))
+        self._tempo_data = sorted(self._score.tempo_data, key=lambda x: (x[0], x[1]))
 
         # Add the default tempo at the beginning
         # if no automation is present at 0
         if not self._tempo_data or self._tempo_data[0][0] != 0:
-            default_tempo = self._root.find(".//Score/Properties/Tempo")
-            if default_tempo is not None and default_tempo.text:
-                default_bpm = int(default_tempo.text.split()[0])
-                self._tempo_data.insert(0, (0, default_bpm))
+            if self._score.default_tempo is not None:
+                self._tempo_data.insert(0, (0, self._score.default_tempo))
             else:
                 self._tempo_data.insert(0, (0, 120))
 
     def _retrieve_track_data(self) -> None:
-        # Get the number of staves
-        track_elements = self._root.findall(".//Tracks/Track")
-        for track_element in track_elements:
-            # Get the id
-            track_id = int(track_element.get("id", -1))
-            if track_id < 0: continue
-
-            # Determine if the track is a drum track
-            instrumentset_type_element = track_element.find(".//InstrumentSet/Type")
-            if instrumentset_type_element is None: continue
-            instrumentset_type_text = instrumentset_type_element.text
-            if instrumentset_type_text == GP_DRUM_KIT_TYPE:
-                self._drum_track_id = track_id
-
-            # Get the number of staves
-            staff_elements = track_element.findall(".//Staves/Staff")
-            self._track_num_staves[track_id] = len(staff_elements)
-
-        # Check if a drum track was found
-        if self._drum_track_id < 0:
-            raise ValueError("No drum track found in the GP file.")
+        self._track_num_staves = self._score.track_num_staves
 
-    def _retrieve_rhythm_data(self) -> None:
-        rhythm_elements = self._root.findall(".//Rhythms/Rhythm")
-        for rhythm_element in rhythm_elements:
-            # Get the id
-            rhythm_id = int(rhythm_element.get("id", -1))
-            if rhythm_id < 0: continue
-
-            # Get the rhythm value
-            value_element = rhythm_element.find(".//NoteValue")
-            if value_element is None: continue
-            value_text = value_element.text
-            if value_text is None: continue
-            rhythm_value = GP_RHYTHM_DICT.get(value_text, None)
-            if rhythm_value is None: continue
-
-            # Get the tuplet kind
-            tuplet_element = rhythm_element.find(".//PrimaryTuplet")
-            if tuplet_element is not None:
-                tuplet_numer_text = tuplet_element.get("num", "1")
-                tuplet_denom_text = tuplet_element.get("den", "1")
-                try:
-                    tuplet_numer = float(tuplet_numer_text)
-                    tuplet_denom = float(tuplet_denom_text)
-
-                    # Adjust the rhythm value
-                    rhythm_value *= tuplet_numer/tuplet_denom
-                except ValueError:
-                    pass
-
-            # Handle dotted notes
-            dot_element = rhythm_element.find(".//AugmentationDot")
-            if dot_element is not None:
-                dot_count_text = dot_element.get("count", "0")
-                try:
-                    dot_count = int(dot_count_text)
-
-                    # Adjust the rhythm value
-                    factor = 1.0
-                    for i in range(dot_count):
-                        factor += 1 / 2**(i+1)
-                    rhythm_value /= factor
-                except ValueError:
-                    pass
-
-            self._rhythm_data[rhythm_id] = rhythm_value
-
-    def _retrieve_note_data(self) -> None:
-        note_elements = self._root.findall(".//Notes/Note")
-        for note_element in note_elements:
-            # Get the id
-            note_id = int(note_element.get("id", -1))
-            if note_id < 0: continue
-
-            # Get the midi note
-            midi_note_element = note_element.find(".//Property[@name='Midi']/Number")
-            if midi_note_element is None: continue
-            midi_note_text = midi_note_element.text
-            if midi_note_text is None: continue
-            midi_note = int(midi_note_text)
-
-            # Check if it's a tied note
-            tied_note = False
-            tie_element = note_element.find(".//Tie")
-            if tie_element is not None:
-                tie_destination = tie_element.get("destination", "false")
-                if tie_destination == "true":
-                    tied_note = True
-
-            # Parse the accent
-            accent = Accent.NONE
-            accent_element = note_element.find(".//Accent")
-            if accent_element is not None:
-                accent_text = accent_element.text
-                if accent_text is not None:
-                    try:
-                        accent_int = int(accent_text)
-                        accent = Accent(accent_int)
-                    except ValueError:
-                        raise
-
-            # Parse the anti-accent
-            anti_accent = AntiAccent.NONE
-            anti_accent_element = note_element.find(".//AntiAccent")
-            if anti_accent_element is not None:
-                anti_accent_text = anti_accent_element.text
-                if anti_accent_text is not None:
-                    try:
-                        anti_accent = AntiAccent(anti_accent_text)
-                    except ValueError:
-                        raise
-
-            # Create the note
-            note = Note(note_id, midi_note, tied_note, accent, anti_accent)
-            self._note_data[note_id] = note
-
-    def _retrieve_beat_data(self) -> None:
-        beat_elements = self._root.findall(".//Beats/Beat")
-        for beat_element in beat_elements:
-            # Get the id
-            beat_id = int(beat_element.get("id", -1))
-            if beat_id < 0: continue
-
-            # Get the rhythm id
-            rhythm_element = beat_element.find(".//Rhythm")
-            if rhythm_element is None: continue
-            rhythm_id = int(rhythm_element.get("ref", -1))
-            if rhythm_id < 0: continue
-
-            # Get the rhythm value
-            rhythm = self._rhythm_data.get(rhythm_id, -1)
-            if rhythm < 0: continue
-
-            # Get the note ids (empty for rests)
-            notes_element = beat_element.find(".//Notes")
-            note_ids: list[int] = []
-            if notes_element is not None:
-                notes_text = notes_element.text
-                if notes_text is not None:
-                    note_ids = [int(note_str) for note_str in notes_text.split(" ")]
-
-            # Get the notes
-            notes: list[Note] = []
-            for note_id in note_ids:
-                # Get the note
-                note = self._note_data.get(note_id, None)
-                if note is None: continue
-
-                # Append the note to the list
-                notes.append(note)
-
-            # Get the grace note type
-            grace_note_type = GraceNoteType.NONE
-            grace_note_element = beat_element.find(".//GraceNotes")
-            if grace_note_element is not None:
-                grace_note_text = grace_note_element.text
-                if grace_note_text is not None:
-                    try:
-                        grace_note_type = GraceNoteType(grace_note_text)
-                    except ValueError:
-                        pass
-
-            # Get the dynamic
-            dynamic = Dynamic[GP_DEFAULT_DYNAMIC]
-            dynamic_element = beat_element.find(".//Dynamic")
-            if dynamic_element is not None:
-                dynamic_text = dynamic_element.text
-                if dynamic_text is not None:
-                    try:
-                        dynamic = Dynamic[dynamic_text]
-                    except KeyError:
-                        pass
-
-            # Create the beat
-            beat = Beat(beat_id, notes, rhythm, dynamic, grace_note_type)
-            self._beat_data[beat_id] = beat
-
-    def _retrieve_voice_data(self) -> None:
-        voice_elements = self._root.findall(".//Voices/Voice")
-        for voice_element in voice_elements:
-            # Get the id
-            voice_id = int(voice_element.get("id", -1))
-            if voice_id < 0: continue
-
-            # Get the beat ids
-            beats_element = voice_element.findall(".//Beats")
-            if not beats_element: continue
-            beat_ids_text = beats_element[0].text
-            if beat_ids_text is None: continue
-            beat_ids = [int(beat_str) for beat_str in beat_ids_text.split(" ")]
-
-            # Save the the beat ids in the voice data
-            self._voice_data[voice_id] = beat_ids
-
-    def _retrieve_bar_data(self) -> None:
-        # Find all Bar elements
-        bar_elements = self._root.findall(".//Bars/Bar")
-        for bar_element in bar_elements:
-            # Get the bar number
-            bar_number = int(bar_element.get("id", -1))
-            if bar_number < 0: continue
-
-            # Get the voice ids
-            voices_element = bar_element.find(".//Voices")
-            if voices_element is None: continue
-            voices_text = voices_element.text
-            if voices_text is None: continue
-            voice_ids = [
-                int(voice_str)
-                for voice_str in voices_text.split(" ")
-                if voice_str != str(GP_INVALID_VOICE)
-            ]
+        # Unless another one is given, the last drum kit track is used as the drum track
+        drum_tracks = drum_track_ids(self._score)
+        if not drum_tracks:
+            raise ValueError("No drum track found in the GP file.")
+        if self._drum_track_id < 0:
+            self._drum_track_id = drum_tracks[-1]
+        elif self._drum_track_id not in drum_tracks:
+            raise ValueError(f"Track {self._drum_track_id} is not a drum track.")
 
-            # Save the the beat ids in the bar data
-            self._bar_data[bar_number] = voice_ids
+        # The first guitar and bass tracks
+        if self._fret_tracks:
+            self._guitar_track_id = _find_track(self._score, GP_GUITAR_TYPE_KEYWORD)
+            self._bass_track_id = _find_track(self._score, GP_BASS_TYPE_KEYWORD)
 
     def _retrieve_master_bar_data(self) -> None:
         # Find out if there is an anacrusis
-        anacrusis_element = self._root.find(".//Anacrusis")
-        if anacrusis_element is not None:
+        if self._score.has_anacrusis:
             self._has_anacrusis = True
             # TODO: add support for anacrusis
             raise NotImplementedError("Anacruses (pickup bars) are not supported yet.")
 
-        # Find all MasterBar elements
-        master_bar_elements = self._root.findall(".//MasterBar")
-
         # Determine the number of master bars
-        self._num_master_bars = len(master_bar_elements)
+        self._num_master_bars = len(self._score.master_bar_data)
         if self._num_master_bars == 0: return
 
-        # Iterate through the MasterBar elements
-        for master_bar, master_bar_element in enumerate(master_bar_elements):
-            # Time signature
-            numer, denom = -1, -1
-            time_signature_element = master_bar_element.find("Time")
-            if time_signature_element is not None:
-                time_signature = time_signature_element.text
-                if time_signature is not None:
-                    numer, denom = map(int, time_signature.split("/"))
-                    self._time_signature_data.append((master_bar, numer, denom))
-
-            # Section name
-            section_element = master_bar_element.find("Section/Text")
-            if section_element is not None:
-                section_name = section_element.text
-                if section_name:
-                    section_name = section_name.replace("\n", "")
-                    self._section_data.append((master_bar, section_name))
-
-            # Bar number
-            bars_element = master_bar_element.find("Bars")
-            if bars_element is None: continue
-            bars_text = bars_element.text
-            if not bars_text: continue
-            bar_ids = [int(bar_id_text) for bar_id_text in bars_text.split(" ")]
-
-            # Determine which bar id is part of the drum track
-            bar_id_idx = 0
-            track_id = 0
-            track_num_staves = self._track_num_staves.get(track_id, -1)
-            if track_num_staves < 0: raise ValueError("Drum track not found.")
-            while (
-                track_id != self._drum_track_id and
-                track_id < len(self._track_num_staves) and
-                bar_id_idx < len(bar_ids)
-            ):
-                # Increment the bar id index by the amount of staves of the current track
-                bar_id_idx += track_num_staves
+        # Determine where the bar of each track is in the bar ids of a master bar
+        drum_bar_idx = self._track_bar_index(self._drum_track_id)
+        guitar_bar_idx = self._track_bar_index(self._guitar_track_id) if self._guitar_track_id >= 0 else -1
+        bass_bar_idx = self._track_bar_index(self._bass_track_id) if self._bass_track_id >= 0 else -1
 
-                # Go to the next track
-                track_id += 1
-                track_num_staves = self._track_num_staves.get(track_id, -1)
-                if track_num_staves < 0: raise ValueError("Drum track not found.")
+        # Iterate through the master bars
+        for bar_ids in self._score.master_bar_data:
+            if not bar_ids: continue
 
             # Check if the bar id index is valid
-            if bar_id_idx >= len(bar_ids):
+            if drum_bar_idx >= len(bar_ids):
                 raise ValueError("No bar corresponding to drum track found.")
 
-            # The found bar id corresponds to the drum track
-            self._drum_bar_ids.append(bar_ids[bar_id_idx])
+            # The found bar ids correspond to the tracks
+            self._drum_bar_ids.append(bar_ids[drum_bar_idx])
+            if guitar_bar_idx >= 0:
+                self._guitar_bar_ids.append(bar_ids[guitar_bar_idx] if guitar_bar_idx < len(bar_ids) else -1)
+            if bass_bar_idx >= 0:
+                self._bass_bar_ids.append(bar_ids[bass_bar_idx] if bass_bar_idx < len(bar_ids) else -1)
 
         # Sort the time signatures and sections by bar
-        self._time_signature_data.sort(key=lambda x: x[0])
-        self._section_data.sort(key=lambda x: x[0])
-
-
-    def _master_bar_fraction_to_ch_ticks(self,
-        fraction: float,
-        ts: tuple[int,int]
-    ) -> float:
-        # Amount of quarter notes in the master bar
-        quarter_notes = 4 * ts[0]/ts[1]
-        # Amount of ticks in the whole master bar
-        master_bar_ticks = self._resolution * quarter_notes
-        # Convert the fraction to ticks
-        ticks = fraction * master_bar_ticks
-        return ticks
-
-    def _rhythm_to_ch_ticks(self, rhythm: float) -> float:
-        # Amount of quarter notes in the rhythm
-        quarter_notes = 4 / rhythm
-        # Convert the rhythm to ticks
-        ticks = self._resolution * quarter_notes
-        return ticks
-
-    def _decrease_ch_notes_intensity(self, ch_notes: list[CHMidiNote]) -> None:
-        # Decrease the intensity by removing accents or adding ghost notes
-        for note in range(CHMidiNote.RED, CHMidiNote.GREEN + 1):
-            if note not in ch_notes: continue
-            accent = CHMidiNote(note + CH_NOTE_TO_ACCENT)
-            ghost = CHMidiNote(note + CH_NOTE_TO_GHOST)
-            if accent in ch_notes:
-                ch_notes.remove(accent)
-            elif ghost not in ch_notes:
-                ch_notes.append(ghost)
-
-    def _increase_ch_notes_intensity(self, ch_notes: list[CHMidiNote]) -> None:
-        # Increase the intensity by adding accents or removing ghost notes
-        for note in range(CHMidiNote.RED, CHMidiNote.GREEN + 1):
-            if note not in ch_notes: continue
-            accent = CHMidiNote(note + CH_NOTE_TO_ACCENT)
-            ghost = CHMidiNote(note + CH_NOTE_TO_GHOST)
-            if ghost in ch_notes:
-                ch_notes.remove(ghost)
-            elif accent not in ch_notes:
-                ch_notes.append(accent)
+        self._time_signature_data = sorted(self._score.time_signature_data, key=lambda x: x[0])
+        self._section_data = sorted(self._score.section_data, key=lambda x: x[0])
+
+
+    def _track_bar_index(self, track_id: int) -> int:
+        # Every track has a bar per staff in the master bars, in track order,
+        # so the first bar of a track comes after the staves of the tracks before it
+        bar_id_idx = 0
+        for previous_track_id in range(track_id + 1):
+            track_num_staves = self._track_num_staves.get(previous_track_id, -1)
+            if track_num_staves < 0: raise ValueError(f"Track {track_id} not found.")
+            if previous_track_id < track_id:
+                bar_id_idx += track_num_staves
+        return bar_id_idx
+
+    def _retrieve_tick_scale(self) -> None:
+        # Amount of ticks in a whole note
+        whole_note_ticks = 4 * self._resolution
+
+        # Use the smallest sub-tick for which the lengths
+        # of all rhythms and master bars are whole numbers
+        rhythm_ticks = {rhythm_id: whole_note_ticks / rhythm for rhythm_id, rhythm in self._score.rhythm_data.items()}
+        bar_ticks = [Fraction(whole_note_ticks * numer, denom) for _, numer, denom in self._time_signature_data]
+        self._tick_scale = lcm(1, *(ticks.denominator for ticks in [*rhythm_ticks.values(), *bar_ticks]))
+
+        # Length of every rhythm in sub-ticks, -1 for unknown rhythms
+        # (the extra last entry is read for rhythm id -1)
+        self._rhythm_sub_ticks = np.full(max(rhythm_ticks, default=-1) + 2, -1, dtype=np.int64)
+        for rhythm_id, ticks in rhythm_ticks.items():
+            self._rhythm_sub_ticks[rhythm_id] = int(ticks * self._tick_scale)
+
+    def _create_master_bar_timeline(self) -> None:
+        if self._num_master_bars <= 0: return
+
+        # Place the master bars and the tempo changes once, for all stages
+        self._tempo_map = TempoMap(
+            self._num_master_bars,
+            self._time_signature_data,
+            self._tempo_data,
+            self._resolution,
+            tick_scale=self._tick_scale,
+            start_tick=self.start_tick
+        )
+
+    def _get_tempo_map(self) -> TempoMap:
+        if self._tempo_map is None:
+            raise ValueError("No master bars found in the GP file.")
+        return self._tempo_map
 
     def _create_sync_track_data(self) -> None:
-        tick = self.start_tick
-        ts_idx = 0
-        ts_numer, ts_denom = -1, -1
-        tempo_idx = 0
-        bpm = DefaultValues.SONG_BPM
-        for master_bar in range(self._num_master_bars):
-            # Save the starting tick of the master bar
-            self._master_bar_start_ticks.append(tick)
-
-            # Fractional position in terms of master bars
-            master_bar_position = float(master_bar)
-
-            # Check if there is a time signature change at this master bar
-            if ts_idx < len(self._time_signature_data):
-                ts_point = self._time_signature_data[ts_idx]
-                if ts_point[0] == master_bar:
-                    # If the master bar matches,
-                    # add the time signature to the sync track data
-                    ts_numer, ts_denom = self._time_signature_data[ts_idx][1:3]
-                    self._sync_track_data.append((
-                        round(tick), SyncTrackPointType.TIME_SIGNATURE,
-                        (ts_numer, round(log2(ts_denom)))
-                    ))
-                    ts_idx += 1
-            if ts_numer <= 0 or ts_denom <= 0:
-                raise ValueError(f"Invalid time signature ({ts_numer}/{ts_denom}).")
-
-            # Check if there are tempo changes at this master bar
-            tempo_changed = False
-            if tempo_idx < len(self._tempo_data):
-                tempo_point = self._tempo_data[tempo_idx]
-                master_bar_position_prev = master_bar_position
-
-                # Add each tempo change in this master bar to the sync track data
-                while int(tempo_point[0]) == master_bar:
-                    # Increment the tick up to the tempo point
-                    master_bar_fraction = tempo_point[0] - master_bar_position_prev
-                    if master_bar_fraction > 1e-10:
-                        tempo_changed = True
-                    tick += self._master_bar_fraction_to_ch_ticks(
-                        master_bar_fraction,
-                        (ts_numer, ts_denom)
-                    )
-
-                    # Create the sync track point
-                    bpm = tempo_point[1]
-                    if bpm <= 0: raise ValueError(f"Invalid BPM value ({bpm}).")
-                    self._tick_tempo_data.append((tick, bpm))
-                    self._sync_track_data.append((
-                        round(tick), SyncTrackPointType.BPM,
-                        round(1000 * bpm)
-                    ))
-                    tempo_idx += 1
-
-                    # Update the tempo point
-                    master_bar_position_prev = tempo_point[0]
-                    if tempo_idx < len(self._tempo_data):
-                        tempo_point = self._tempo_data[tempo_idx]
-                        master_bar_position = tempo_point[0]
-                    else:
-                        break
-
-                # If there was no tempo change, go back to the previous position
-                master_bar_position = master_bar_position_prev
-
-            # Increment the tick up to the next master bar
-            if tempo_changed:
-                master_bar_fraction = master_bar+1 - master_bar_position
-            else:
-                master_bar_fraction = 1
-            tick += self._master_bar_fraction_to_ch_ticks(
-                master_bar_fraction,
-                (ts_numer, ts_denom)
-            )
-
-            # Save the ending tick of the master bar
-            self._master_bar_end_ticks.append(tick)
+        tempo_map = self._get_tempo_map()
+
+        # Add the time signature changes at the start of their master bar
+        master_bar_start_ticks = tempo_map.master_bar_start_ticks.tolist()
+        for master_bar, ts_numer, ts_denom in self._time_signature_data:
+            if master_bar >= self._num_master_bars: continue
+            self._sync_track_data.append((
+                tempo_map.sub_ticks_to_ticks(master_bar_start_ticks[master_bar]), SyncTrackPointType.TIME_SIGNATURE,
+                (ts_numer, round(log2(ts_denom)))
+            ))
+
+        # Add the tempo changes
+        for tick, bpm in tempo_map.tempo_changes:
+            self._sync_track_data.append((
+                tick, SyncTrackPointType.BPM,
+                round(1000 * bpm)
+            ))
 
         # Sort the sync track data by tick
         self._sync_track_data.sort(key=lambda x: x[0])
 
     def _create_events_data(self) -> None:
+        tempo_map = self._get_tempo_map()
+
         # Start
         self._events_data.append((0, "music_start"))
 
         # Sections
         for master_bar, section_name in self._section_data:
             # Get the starting tick of the section
-            start_tick = round(self._master_bar_start_ticks[master_bar])
+            start_tick = tempo_map.position_to_ticks(master_bar)
             # Add the section to the events data
             self._events_data.append((start_tick, f"section {section_name}"))
 
         # End
-        end_tick = round(self._master_bar_end_ticks[-1])
+        end_tick = tempo_map.position_to_ticks(self._num_master_bars)
         self._events_data.append((end_tick, "music_end"))
         self._events_data.append((end_tick, "end"))
 
         # Sort the events data by tick
         self._events_data.sort(key=lambda x: x[0])
 
+    def _track_beats(self, bar_ids: list[int]) -> Iterator[tuple[int,int,int,int]]:
+        # (master bar, starting sub-tick, length in sub-ticks, beat id) of every beat of a track,
+        # with the grace notes taking their time from the beats around them
+        score = self._score
+        before_beat = GRACE_NOTE_TYPES.index(GraceNoteType.BEFORE_BEAT)
+        on_beat = GRACE_NOTE_TYPES.index(GraceNoteType.ON_BEAT)
+
+        # Get the bar id of the track in every master bar
+        if len(bar_ids) < self._num_master_bars:
+            raise ValueError(f"No track data found for master bar {len(bar_ids)}.")
+        track_bar_ids = np.array(bar_ids[:self._num_master_bars], dtype=np.int64)
+        master_bars = np.flatnonzero(track_bar_ids >= 0)
+
+        # Gather the beats of the track only, voice after voice
+        bar_voices = score.bar_voices.select(track_bar_ids[master_bars])
+        voice_beats = score.voice_beats.select(bar_voices.values)
+        beat_ids = voice_beats.values
+        beat_master_bars = master_bars[bar_voices.value_rows()][voice_beats.value_rows()]
+
+        # Every voice starts at the beginning of the master bar
+        is_voice_start = np.zeros(len(beat_ids), dtype=bool)
+        is_voice_start[voice_beats.offsets[:-1][np.diff(voice_beats.offsets) > 0]] = True
+        voice_start_ticks = self._get_tempo_map().master_bar_start_ticks[beat_master_bars]
+
+        # Amount of sub-ticks to shorten the current note by
+        delta_ticks = 0
+        tick = 0
+
+        for master_bar, voice_start, voice_start_tick, rhythm_ticks, grace_note_type, beat_id in zip(
+            beat_master_bars.tolist(),
+            is_voice_start.tolist(),
+            voice_start_ticks.tolist(),
+            self._rhythm_sub_ticks[score.beat_rhythm[beat_ids]].tolist(),
+            score.beat_grace_note_type[beat_ids].tolist(),
+            beat_ids.tolist()
+        ):
+            if voice_start:
+                tick = voice_start_tick
+
+            # Skip beats that are missing
+            if rhythm_ticks < 0: continue
+
+            # Calculate the length of the beat
+            beat_ticks = rhythm_ticks - delta_ticks
+            delta_ticks = 0
+
+            # Handle grace notes:
+            #   before beat -> subtract length of grace note from ticks
+            #   on beat     -> decrease length of next note by length of grace note
+            if grace_note_type == before_beat:
+                tick -= rhythm_ticks
+            elif grace_note_type == on_beat:
+                delta_ticks = rhythm_ticks
+
+            yield master_bar, tick, beat_ticks, beat_id
+
+            # Move to the next beat
+            tick += beat_ticks
+
     def _create_expert_drums_data(self) -> None:
+        score = self._score
+
+        # Beats of the drum track, and their notes back to back
+        beats = np.array(list(self._track_beats(self._drum_bar_ids)), dtype=np.int64).reshape(-1, 4)
+        _, beat_sub_ticks, _, beat_ids = beats.T
+        beat_notes = score.beat_notes.select(beat_ids)
+        note_ids = beat_notes.values
+
+        # Dynamic level of every note, from its beat
         default_dynamic = Dynamic[GP_DEFAULT_DYNAMIC]
+        note_dynamics = score.beat_dynamic[beat_ids][beat_notes.value_rows()]
+        note_dynamic_levels = np.select(
+            [note_dynamics < default_dynamic, note_dynamics > default_dynamic],
+            [DRUMS_DYNAMIC_SOFTER, DRUMS_DYNAMIC_LOUDER],
+            DRUMS_DYNAMIC_DEFAULT
+        )
+
+        # Index of the CH notes of every note in the drums table,
+        # with the intensity changed by the anti-accent, accent and dynamic
+        # (-1 for tied notes, notes outside of the midi range and unmapped notes)
+        note_midi = score.note_midi[note_ids].astype(np.int64)
+        note_accents = score.note_accent[note_ids]
+        note_accent_levels = np.zeros(len(note_ids), dtype=np.int64)
+        for accent, accent_level in DRUMS_ACCENT_LEVELS.items():
+            note_accent_levels[note_accents == accent] = accent_level
+        is_valid_note = (note_midi >= 0) & (note_midi < 128) & ~score.note_tied[note_ids]
+        note_table_indices = np.where(
+            is_valid_note,
+            drums_table_index(
+                note_midi,
+                score.note_anti_accent[note_ids] == ANTI_ACCENTS.index(AntiAccent.GHOST_NOTE),
+                note_accent_levels,
+                note_dynamic_levels
+            ),
+            -1
+        )
+        is_unmapped_note = is_valid_note & _DRUMS_UNMAPPED_TABLE[np.maximum(note_table_indices, 0)]
+        note_table_indices[is_unmapped_note] = -1
+
+        # CH notes of every beat back to back, with their tick in the chart and in their master bar
+        # (a beat that overflows its master bar is placed in the master bar it reaches)
+        tempo_map = self._get_tempo_map()
+        note_ch_notes = _DRUMS_CH_NOTE_LISTS.select(note_table_indices)
+        ch_note_beats = beat_notes.value_rows()[note_ch_notes.value_rows()]
+        bar_start_ticks = tempo_map.sub_ticks_array_to_ticks(tempo_map.master_bar_start_ticks)
+        beat_ticks = tempo_map.sub_ticks_array_to_ticks(beat_sub_ticks)
+        beat_bar_start_ticks = bar_start_ticks[np.maximum(np.searchsorted(bar_start_ticks, beat_ticks, side="right") - 1, 0)]
+        note_ticks = beat_ticks[ch_note_beats]
+
+        # Sort the notes of the voices by tick, keeping the notes of every beat together
+        note_order = np.argsort(note_ticks, kind="stable")
+        ch_note_beats = ch_note_beats[note_order]
+        self._expert_notes = note_ch_notes.values[note_order]
+        self._expert_note_ticks = note_ticks[note_order]
+        self._expert_note_bar_ticks = self._expert_note_ticks - beat_bar_start_ticks[ch_note_beats]
+
+        # Add a point for every beat with CH notes to the export drums data
+        is_point_start = np.diff(ch_note_beats, prepend=-1) != 0
+        point_starts = np.flatnonzero(is_point_start)
+        self._expert_note_points = np.cumsum(is_point_start) - 1
+        ch_notes = self._expert_notes.tolist()
+        bounds = np.r_[point_starts, len(ch_notes)].tolist()
+        self._export_drums_data = [
+            (tick, TrackPointType.NOTE, ch_notes[start:end])
+            for tick, start, end in zip(self._expert_note_ticks[point_starts].tolist(), bounds, bounds[1:])
+        ]
+
+        if not self._profiler.enabled: return
+        self._profiler.count("chart.beats", len(beats))
+        self._profiler.count("chart.notes", len(note_ids))
+        self._profiler.count("chart.unmapped_notes", int(is_unmapped_note.sum()))
+        self._profiler.count("chart.note_points", len(self._export_drums_data))
+        self._profiler.set_value(
+            "chart.unmapped_midi_notes",
+            sorted(set(note_midi[is_unmapped_note].tolist()))
+        )
+
+    def _create_lower_drums_data(self) -> None:
+        # Expert notes in bulk: a row per CH note
+        notes = self._expert_notes
+        ticks = self._expert_note_ticks
+        bar_ticks = self._expert_note_bar_ticks
+        point_indices = self._expert_note_points
+        lanes = _CH_NOTE_LANE_TABLE[notes]
+        kinds = _CH_NOTE_KIND_TABLE[notes]
+
+        # Index the hits (a lane at a tick) that the notes hit or change
+        hit_keys, hit_ids = np.unique(ticks * _NUM_LANES + lanes, return_inverse=True)
+        hit_ticks, hit_lanes = np.divmod(hit_keys, _NUM_LANES)
+        is_cymbal_hit = np.zeros(len(hit_keys), dtype=bool)
+        is_cymbal_hit[hit_ids[kinds == CHNoteKind.CYMBAL]] = True
+
+        # Order of the hits of every tick in which the hand lanes are kept: snare first, then cymbals, then toms
+        hit_priorities = np.where(hit_lanes == 1, 0, np.where(is_cymbal_hit, 1, 2))
+        hit_order = np.lexsort((hit_lanes, hit_priorities, hit_ticks))
+        ordered_ticks = hit_ticks[hit_order]
+        tick_starts = np.r_[True, ordered_ticks[1:] != ordered_ticks[:-1]]
+        positions = np.arange(len(hit_order))
+        tick_start_positions = np.maximum.accumulate(np.where(tick_starts, positions, 0))
+
+        for difficulty, reduction in DRUMS_REDUCTIONS.items():
+            # Thin the notes by their metric position in their master bar
+            hand_grid = self._resolution * 4 // reduction.hand_division
+            kick_grid = self._resolution * 4 // reduction.kick_division
+            keep = np.where(lanes == 0, bar_ticks % kick_grid == 0, bar_ticks % hand_grid == 0)
+
+            # Drop the double kick, and the accent and ghost markers (keeping the hits they change)
+            if not reduction.double_kick:
+                keep &= kinds != CHNoteKind.KICK2
+            if not reduction.dynamics:
+                keep &= (kinds != CHNoteKind.ACCENT) & (kinds != CHNoteKind.GHOST)
+
+            # Collapse the hand lanes of every tick
+            is_kept_hand_hit = np.zeros(len(hit_keys), dtype=bool)
+            is_kept_hand_hit[hit_ids[keep & (kinds == CHNoteKind.HIT) & (lanes > 0)]] = True
+            ordered_kept = is_kept_hand_hit[hit_order].astype(np.int64)
+            kept_counts = np.cumsum(ordered_kept)
+            ranks = kept_counts - (kept_counts - ordered_kept)[tick_start_positions]
+            is_allowed_hit = np.zeros(len(hit_keys), dtype=bool)
+            is_allowed_hit[hit_order] = (ordered_kept == 1) & (ranks <= reduction.max_hand_lanes)
+
+            # Keep the kicks and the hand lanes that are left, with their markers
+            keep &= (lanes == 0) | is_allowed_hit[hit_ids]
+
+            # Group the remaining notes by their expert point again
+            kept_notes = notes[keep].tolist()
+            kept_point_indices = point_indices[keep]
+            starts = np.flatnonzero(np.diff(kept_point_indices, prepend=-1))
+            bounds = np.r_[starts, len(kept_notes)].tolist()
+            self._lower_drums_data[difficulty] = [
+                (tick, TrackPointType.NOTE, kept_notes[start:end])
+                for tick, start, end in zip(ticks[keep][starts].tolist(), bounds, bounds[1:])
+            ]
 
-        # Amount to change the current note duration by
-        delta_rhythm: float | None = None
-
-        tick = self.start_tick
-        ts_idx = 0
-        _, ts_numer, ts_denom = self._time_signature_data[ts_idx]
-        tempo_idx = 0
-        for master_bar in range(self._num_master_bars):
-            # Get the bar id of the drum track
-            if master_bar >= len(self._drum_bar_ids):
-                raise ValueError(f"No drum data found for master bar {master_bar}.")
-            bar_id = self._drum_bar_ids[master_bar]
-
-            # Update the time signature
-            while ts_idx+1 < len(self._time_signature_data):
-                next_ts_bar, _, _ = self._time_signature_data[ts_idx+1]
-                if next_ts_bar > master_bar: break
-                # If the master bar matches, update the time signature
-                ts_idx += 1
-                _, ts_numer, ts_denom = self._time_signature_data[ts_idx]
-
-            # Get the voices in this bar
-            voice_ids = self._bar_data.get(bar_id, None)
-            if voice_ids is None: continue
-
-            # Start at the current position
-            master_bar_position = float(master_bar)
-
-            # Go through all notes in this bar
-            for voice_id in voice_ids:
-                # Get the beat ids in this voice
-                beat_ids = self._voice_data.get(voice_id, None)
-                if beat_ids is None: continue
-
-                for beat_id in beat_ids:
-                    # Get the beat object
-                    beat = self._beat_data.get(beat_id, None)
-                    if beat is None: continue
-
-                    # Calculate the rhythm
-                    rhythm = beat.rhythm
-                    if delta_rhythm is not None:
-                        rhythm = 1/(1/rhythm + 1/delta_rhythm)
-                        delta_rhythm = None
-
-                    # Convert the midi notes to CH notes
-                    ch_notes: list[CHMidiNote] = []
-                    for note in beat.notes:
-                        # Skip if it's a tied note
-                        if note.tied: continue
-
-                        # Convert the midi note to a GP note
-                        gp_note = GPMidiNote(note.midi)
-
-                        # Convert the midi note to CH notes
-                        midi_ch_notes = DRUMS_GP_TO_CH_MAPPING.get(gp_note, None)
-                        if midi_ch_notes is None: continue
-                        midi_ch_notes = midi_ch_notes.copy()
-
-                        # Handle anti-accents
-                        match note.anti_accent:
-                            case AntiAccent.GHOST_NOTE:
-                                self._decrease_ch_notes_intensity(midi_ch_notes)
-                            case _:
-                                pass
-
-                        # Handle accents
-                        match note.accent:
-                            case Accent.ACCENT:
-                                self._increase_ch_notes_intensity(midi_ch_notes)
-                            case Accent.HEAVY_ACCENT:
-                                # Max out intensity
-                                self._increase_ch_notes_intensity(midi_ch_notes)
-                                self._increase_ch_notes_intensity(midi_ch_notes)
-                            case Accent.STACCATO:
-                                # Max out intensity
-                                self._increase_ch_notes_intensity(midi_ch_notes)
-                                self._increase_ch_notes_intensity(midi_ch_notes)
-                            case _:
-                                pass
-
-                        # Handle the beat dynamic
-                        if beat.dynamic < default_dynamic:
-                            # Decrease the intensity
-                            self._decrease_ch_notes_intensity(midi_ch_notes)
-                        elif beat.dynamic > default_dynamic:
-                            # Increase the intensity
-                            self._increase_ch_notes_intensity(midi_ch_notes)
-
-                        # Add the notes to the list
-                        ch_notes.extend(midi_ch_notes)
-
-                    # Handle grace notes:
-                    #   before beat -> subtract length of grace note from ticks
-                    #   on beat     -> decrease length of next note by length of grace note
-                    if beat.grace_note_type is GraceNoteType.BEFORE_BEAT:
-                        tick -= self._rhythm_to_ch_ticks(beat.rhythm)
-                    elif beat.grace_note_type is GraceNoteType.ON_BEAT:
-                        delta_rhythm = -beat.rhythm
-
-                    # Add the notes to the export drums data
-                    if ch_notes:
-                        self._export_drums_data.append((
-                            round(tick), TrackPointType.NOTE,
-                            ch_notes
-                        ))
-
-                    # Calculate the next master bar position
-                    master_bar_fraction = (ts_denom/ts_numer) / rhythm
-                    next_master_bar_position = master_bar_position + master_bar_fraction
-
-                    # Update the current tick, master bar position, and bpm
-                    while tempo_idx < len(self._tempo_data)-1:
-                        tempo_position, _ = self._tempo_data[tempo_idx+1]
-
-                        # Stop if the tempo change occurs later
-                        if tempo_position > next_master_bar_position:
-                            # Update the current tick
-                            tick += self._master_bar_fraction_to_ch_ticks(
-                                next_master_bar_position - master_bar_position,
-                                (ts_numer, ts_denom)
-                            )
-                            # Update the current master bar position
-                            master_bar_position = next_master_bar_position
-                            break
-
-                        # Update the current tick
-                        tick += self._master_bar_fraction_to_ch_ticks(
-                            tempo_position - master_bar_position,
-                            (ts_numer, ts_denom)
-                        )
-
-                        # Update the current master bar position
-                        master_bar_position = tempo_position
-
-                        # Update the bpm
-                        tempo_idx += 1
-
-                    else:
-                        # Update the current tick
-                        tick += self._master_bar_fraction_to_ch_ticks(
-                            next_master_bar_position - master_bar_position,
-                            (ts_numer, ts_denom)
-                        )
-                        # Update the current master bar position
-                        master_bar_position = next_master_bar_position
+    def _create_fret_data(self, bar_ids: list[int]) -> list[TrackPoint]:
+        score = self._score
+
+        # Beats of the track, and the midi number of their notes back to back
+        # (-1 for grace notes, tied notes and missing notes)
+        beats = list(self._track_beats(bar_ids))
+        beat_ids = np.array([beat_id for _, _, _, beat_id in beats], dtype=np.int64)
+        beat_notes = score.beat_notes.select(beat_ids)
+        note_ids = beat_notes.values
+        is_grace_note = score.beat_grace_note_type[beat_ids] != GRACE_NOTE_TYPES.index(GraceNoteType.NONE)
+        note_midi = np.where(
+            score.note_tied[note_ids] | is_grace_note[beat_notes.value_rows()],
+            -1,
+            score.note_midi[note_ids]
+        ).tolist()
+        note_offsets = beat_notes.offsets.tolist()
+
+        # Spread the pitches of every master bar over the frets
+        fret_data: list[TrackPoint] = []
+        bar_beats: list[tuple[int,int,list[int]]] = []              # (sub-tick, length in sub-ticks, midi notes)
+        current_master_bar = -1
+        for (master_bar, tick, beat_ticks, _), note_start, note_end in zip(beats, note_offsets, note_offsets[1:]):
+            if master_bar != current_master_bar:
+                self._add_fret_points(fret_data, bar_beats)
+                bar_beats = []
+                current_master_bar = master_bar
+
+            midi_notes = [midi for midi in note_midi[note_start:note_end] if midi >= 0]
+            if midi_notes:
+                bar_beats.append((tick, beat_ticks, midi_notes))
+        self._add_fret_points(fret_data, bar_beats)
+
+        # Sort the notes of the voices by tick
+        fret_data.sort(key=lambda x: x[0])
+        return fret_data
+
+    def _add_fret_points(self, fret_data: list[TrackPoint], bar_beats: list[tuple[int,int,list[int]]]) -> None:
+        lanes = fret_lanes(midi for _, _, midi_notes in bar_beats for midi in midi_notes)
+
+        # Notes of at least a quarter note are sustained
+        sub_ticks_to_ticks = self._get_tempo_map().sub_ticks_to_ticks
+        min_sustain_ticks = self._resolution * self._tick_scale
+        for tick, beat_ticks, midi_notes in bar_beats:
+            start_tick = sub_ticks_to_ticks(tick)
+            sustain = 0
+            if beat_ticks >= min_sustain_ticks:
+                sustain = sub_ticks_to_ticks(tick + beat_ticks) - start_tick
+            frets = sorted({lanes[midi] for midi in midi_notes})
+            fret_data.append((start_tick, TrackPointType.NOTE, (frets, sustain)))
+
+
+def drum_track_ids(score: GPScore) -> list[int]:
+    return [
+        track_id
+        for track_id, instrumentset_type in score.track_types.items()
+        if instrumentset_type == GP_DRUM_KIT_TYPE
+    ]
+
+
+def _find_track(score: GPScore, type_keyword: str) -> int:
+    # First track (other than a drum kit) whose instrument type contains the keyword
+    for track_id, instrumentset_type in score.track_types.items():
+        if instrumentset_type == GP_DRUM_KIT_TYPE: continue
+        if type_keyword in instrumentset_type.lower():
+            return track_id
+    return -1
+
+
+def write_album_image_file(filepath: Path, image_file: Path) -> None:
+    # PIL is only imported when there is an album image
+    from PIL import Image
+
+    image = Image.open(image_file)
+    image = image.resize(ALBUM_SIZE)
+    image.save(filepath, format="png")
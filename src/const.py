@@ -1,5 +1,7 @@
 from typing import Any
 
+import os
+import sys
 from pathlib import Path
 from enum import StrEnum
 
@@ -7,6 +9,8 @@ from enum import StrEnum
 # Guitar Pro constants
 GPIF_PATH = Path("Content/score.gpif")
 GP_DRUM_KIT_TYPE = "drumKit"
+GP_GUITAR_TYPE_KEYWORD = "guitar"   # in the (lowercase) instrument set type of guitar tracks
+GP_BASS_TYPE_KEYWORD = "bass"       # in the (lowercase) instrument set type of bass tracks
 GP_INVALID_VOICE = -1
 GP_DEFAULT_DYNAMIC = "MF"
 GP_RHYTHM_DICT = {
@@ -21,8 +25,43 @@ GP_RHYTHM_DICT = {
 
 # Chart constants
 COUNTDOWN_TIME = 2  # seconds
+CHART_RESOLUTIONS = (192, 480, 960)  # ticks per quarter note
 ALBUM_SIZE = (512, 512)
 
+# Audio constants
+DEMUCS_MODEL = "htdemucs_ft"
+DEMUCS_DRUMS_MODEL = "f7e0c4bc"     # drums model of the htdemucs_ft bag, enough to split off the drums
+SPLIT_STEMS = "stems"               # split mode: four stems
+SPLIT_DRUMS = "drums"               # split mode: drums and everything else
+DEMUCS_PARAMETERS = {               # separation parameters that change the stems
+    "shifts":  1,
+    "overlap": 0.25,
+    "split":   True,
+}
+CACHE_DIR = Path(os.environ.get("XDG_CACHE_HOME", Path.home() / ".cache")) / "gp2ch"
+STEM_CACHE_DIR = CACHE_DIR / "stems"
+STEM_CACHE_SIZE = 4 * 1024**3       # bytes
+PCM_BLOCK_SIZE = 1 << 16            # frames
+FILE_BLOCK_SIZE = 1 << 20           # bytes
+ENCODE_JOBS = 4                     # stems encoded at the same time
+SPLIT_JOBS = 1                      # songs split at the same time by a batch without a separation worker
+DEMUCS_MODEL_MEMORY = 1024**3       # bytes used by the separation model (estimate)
+DEMUCS_MEMORY_PER_SAMPLE = 64       # bytes per channel sample of a separated segment (estimate)
+SEGMENT_OVERLAP_TIME = 2            # seconds
+SEGMENT_MIN_TIME = 30               # seconds
+
+# Separation worker constants
+SEPARATION_WORKER_DIR = CACHE_DIR / "worker"
+SEPARATION_WORKER_ADDRESS = (       # Unix socket (named pipe on Windows)
+    r"\\.\pipe\gp2ch-separator" if sys.platform == "win32" else str(SEPARATION_WORKER_DIR / "separator.sock")
+)
+SEPARATION_WORKER_KEY_FILE = SEPARATION_WORKER_DIR / "separator.key"
+
+# Conversion cache constants
+CONVERSION_CACHE_DIR = CACHE_DIR / "conversions"
+CONVERSION_CACHE_SIZE = 2 * 1024**3         # bytes
+CONVERSION_METADATA_FILENAME = "conversion.json"
+
 # Output filenames
 INI_FILENAME = "song.ini"
 NOTES_FILENAME = "notes.chart"
@@ -32,12 +71,14 @@ DRUMS_STREAM_FILENAME = "drums_1.ogg"
 BASS_STREAM_FILENAME = "bass.ogg"
 GUITAR_STREAM_FILENAME = "guitar.ogg"
 VOCALS_STREAM_FILENAME = "vocals.ogg"
+DRUM_TRACK_DIRNAME = "track_{}"     # subfolder of every drum track, when several are charted
+
+# Temporary directories (created for each conversion)
+TMP_DIR_PREFIX = "gp2ch-"
+TMP_OUT_DIRNAME = "out"
 
-# Temporary directories
-TMP_DIR = Path("tmp")
-TMP_GP_DIR = TMP_DIR / "gp"
-TMP_AUDIO_DIR = TMP_DIR / "audio"
-TMP_OUT_DIR = TMP_DIR / "out"
+# Watch mode
+WATCH_INTERVAL = 0.5                # seconds between checks of the GP file
 
 
 # .chart file data
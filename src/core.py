@@ -1,29 +1,576 @@
 import argparse
+import functools
+import hashlib
+import json
+import os
 import shutil
+import sys
+import tempfile
+import time
+from typing import IO
+from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor
+
 from pathlib import Path
-import xml.etree.ElementTree as ET
 
 from .const import (
-    TMP_DIR, TMP_GP_DIR, TMP_OUT_DIR,
-    GPIF_PATH,
+    TMP_DIR_PREFIX, TMP_OUT_DIRNAME,
+    STEM_CACHE_DIR, STEM_CACHE_SIZE,
+    CONVERSION_CACHE_DIR, CONVERSION_CACHE_SIZE, CONVERSION_METADATA_FILENAME,
+    ENCODE_JOBS,
+    SPLIT_STEMS, SPLIT_DRUMS,
+    CHART_RESOLUTIONS,
     INI_FILENAME, NOTES_FILENAME,
     ALBUM_FILENAME,
+    DRUM_TRACK_DIRNAME,
+    WATCH_INTERVAL,
     DefaultValues
 )
-from .gp import extract_gp
-from .chart import DrumChart
+from .gp import GPSource, GPArchive, parse_gpif
+from .chart import DrumChart, drum_track_ids, write_album_image_file
+from .audio import write_audio_files, open_audio_source
+from .cache import FileCache, hash_file_source
+from .profiling import Profiler, NO_PROFILER
 
 
-def convert_gpif_to_ch_chart(gpif_file: Path, split: bool=False) -> DrumChart:
-    if not gpif_file.exists():
+def convert_gpif_to_ch_chart(
+    gpif_file: Path | IO[bytes],
+    split: bool=False,
+    resolution: int=DefaultValues.SONG_RESOLUTION,
+    profiler: Profiler=NO_PROFILER,
+    drum_track_id: int | None=None,
+    fret_tracks: bool=False,
+    drums_only: bool=False
+) -> DrumChart:
+    if isinstance(gpif_file, Path) and not gpif_file.exists():
         raise FileNotFoundError(f"Error: {gpif_file} was not found.")
 
-    # Parse the XML structure
-    tree = ET.parse(gpif_file)
-    root = tree.getroot()
+    # Stream the XML structure
+    with profiler.stage("parse"):
+        score = parse_gpif(gpif_file)
 
     # Create the chart
-    return DrumChart(root, split=split)
+    return DrumChart(
+        score,
+        split=split,
+        resolution=resolution,
+        profiler=profiler,
+        drum_track_id=drum_track_id,
+        fret_tracks=fret_tracks,
+        drums_only=drums_only
+    )
+
+
+def convert_gpif_to_ch_charts(
+    gpif_file: Path | IO[bytes],
+    split: bool=False,
+    resolution: int=DefaultValues.SONG_RESOLUTION,
+    profiler: Profiler=NO_PROFILER,
+    drum_tracks: list[int] | None=None,
+    fret_tracks: bool=False,
+    drums_only: bool=False
+) -> list[DrumChart]:
+    if isinstance(gpif_file, Path) and not gpif_file.exists():
+        raise FileNotFoundError(f"Error: {gpif_file} was not found.")
+
+    # Stream the XML structure once
+    with profiler.stage("parse"):
+        score = parse_gpif(gpif_file)
+
+    # Create a chart for every given drum track (or every drum track) from the same score
+    if drum_tracks is None:
+        drum_tracks = drum_track_ids(score)
+    return [
+        DrumChart(
+            score,
+            split=split,
+            resolution=resolution,
+            profiler=profiler,
+            drum_track_id=drum_track_id,
+            fret_tracks=fret_tracks,
+            drums_only=drums_only
+        )
+        for drum_track_id in drum_tracks
+    ]
+
+
+@dataclass
+class ConversionOptions:
+    output_path: Path                                               # output folder that will be created
+    image_file: Path | None = None                                  # album cover image file
+    audio_file: Path | None = None                                  # audio file to use instead of the embedded one
+    split: bool = False                                             # True to split the audio into stems
+    drums_only: bool = False                                        # True to only split the drums from the rest
+    resolution: int = DefaultValues.SONG_RESOLUTION                 # chart ticks per quarter note
+    drum_tracks: list[int] | None = None                            # track ids of the drum tracks (None for the last one),
+                                                                    # charted in a subfolder each if there are several
+    fret_tracks: bool = False                                       # True to also chart the guitar and bass tracks
+    tmp_dir: Path | None = None                                     # folder in which the scratch folder is created
+    stem_cache_dir: Path | None = STEM_CACHE_DIR                    # folder of the stem cache (None to disable it)
+    stem_cache_size: int = STEM_CACHE_SIZE                          # maximum size of the stem cache in bytes
+    encode_jobs: int = ENCODE_JOBS                                  # stems encoded at the same time
+    max_memory: int | None = None                                   # memory budget of the split in bytes (None for no limit)
+    conversion_cache_dir: Path | None = None                        # folder of the conversion cache (None to disable it,
+                                                                    # the command line uses CONVERSION_CACHE_DIR)
+    conversion_cache_size: int = CONVERSION_CACHE_SIZE              # maximum size of the conversion cache in bytes
+
+@dataclass
+class ConversionResult:
+    output_path: Path                                               # output folder that was created
+    files: list[Path]                                               # files in the output folder
+    title: str
+    artist: str
+
+
+def convert(
+    gp_source: GPSource,
+    options: ConversionOptions,
+    profiler: Profiler = NO_PROFILER
+) -> ConversionResult:
+    # Raise an error if the output path already exists
+    output_path = options.output_path
+    if output_path.exists():
+        raise FileExistsError(f"The output folder {output_path} already exists. Please rename or remove it.")
+
+    # Reuse the output of an earlier conversion of the same inputs
+    conversion_cache = None
+    cache_key = None
+    if options.conversion_cache_dir is not None:
+        with profiler.stage("conversion_cache"):
+            conversion_cache = FileCache(options.conversion_cache_dir, options.conversion_cache_size)
+            cache_key = _conversion_cache_key(gp_source, options)
+            cached_files = conversion_cache.get(cache_key)
+            if cached_files is not None and CONVERSION_METADATA_FILENAME in cached_files:
+                profiler.count("conversion_cache_hits")
+                return _restore_cached_conversion(cached_files, output_path)
+        profiler.count("conversion_cache_misses")
+
+    # Read the GP archive in place,
+    # using a scratch folder of its own for this conversion
+    with profiler.stage("archive"):
+        archive = GPArchive(gp_source)
+    with (
+        archive,
+        tempfile.TemporaryDirectory(prefix=TMP_DIR_PREFIX, dir=options.tmp_dir) as tmp_dir
+    ):
+        tmp_out_dir = Path(tmp_dir) / TMP_OUT_DIRNAME
+        tmp_out_dir.mkdir(parents=True)
+        stem_cache = _create_stem_cache(options)
+
+        # Convert the GPIF file inside the GP archive to CH charts first,
+        # so that errors in the score show up before the audio is split
+        charts = _create_charts(archive, options, profiler)
+        chart = charts[0]
+        chart_folders = _chart_folders(tmp_out_dir, charts)
+
+        # Run the audio and album image stages,
+        # and create the CH output in the meantime
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            audio_future = executor.submit(
+                _write_audio_stage,
+                archive,
+                tmp_out_dir,
+                chart.embedded_file_path,
+                options,
+                stem_cache,
+                profiler
+            )
+            image_future = None
+            if options.image_file is not None:
+                image_future = executor.submit(
+                    _write_album_image_stage,
+                    tmp_out_dir / ALBUM_FILENAME,
+                    options.image_file,
+                    profiler
+                )
+
+            with profiler.stage("write_chart"):
+                _write_charts(charts, chart_folders)
+
+            # Wait for the other stages
+            audio_future.result()
+            if image_future is not None:
+                image_future.result()
+
+        # Every chart folder gets the audio and album image
+        _share_files(tmp_out_dir, chart_folders)
+
+        # Keep the output for later conversions of the same inputs
+        # and link it to its destination
+        if conversion_cache is not None and cache_key is not None:
+            with profiler.stage("output"):
+                metadata_file = Path(tmp_dir) / CONVERSION_METADATA_FILENAME
+                metadata_file.write_text(json.dumps({"title": chart.title, "artist": chart.artist}))
+                files = {
+                    filepath.relative_to(tmp_out_dir).as_posix(): filepath
+                    for filepath in tmp_out_dir.rglob("*")
+                    if filepath.is_file()
+                }
+                files[CONVERSION_METADATA_FILENAME] = metadata_file
+                cached_files = conversion_cache.put(cache_key, files)
+                return _restore_cached_conversion(cached_files, output_path)
+
+        # Move the output folder to its destination
+        with profiler.stage("output"):
+            output_path.parent.mkdir(parents=True, exist_ok=True)
+            shutil.move(tmp_out_dir, output_path)
+
+    return ConversionResult(
+        output_path=output_path,
+        files=sorted(output_path.iterdir()),
+        title=chart.title,
+        artist=chart.artist
+    )
+
+
+def _conversion_cache_key(gp_source: GPSource, options: ConversionOptions) -> str:
+    # Hash the inputs, the options that change the output and the converter itself
+    key_data = json.dumps(
+        {
+            "gp": hash_file_source(gp_source),
+            "audio": _hash_optional_file(options.audio_file),
+            "image": _hash_optional_file(options.image_file),
+            "split": options.split,
+            "drums_only": options.drums_only,
+            "resolution": options.resolution,
+            "drum_tracks": options.drum_tracks,
+            "fret_tracks": options.fret_tracks,
+            "max_memory": options.max_memory,
+            "converter": _converter_digest(),
+        },
+        sort_keys=True
+    )
+    return hashlib.sha256(key_data.encode()).hexdigest()
+
+
+def _hash_optional_file(filepath: Path | None) -> str | None:
+    # Missing files are ignored by the conversion
+    if filepath is None or not filepath.is_file():
+        return None
+    return hash_file_source(filepath)
+
+
+@functools.cache
+def _converter_digest() -> str:
+    # Hash the source of the converter, so that a new version never reuses old outputs
+    digest = hashlib.sha256()
+    for filepath in sorted(Path(__file__).parent.glob("*.py")):
+        digest.update(filepath.name.encode())
+        digest.update(filepath.read_bytes())
+    return digest.hexdigest()
+
+
+def _restore_cached_conversion(cached_files: dict[str,Path], output_path: Path) -> ConversionResult:
+    # Copy the chart files, which are often edited in place,
+    # and hard link the other cached files into the output folder
+    # (or copy them if the cache is on another file system)
+    output_path.mkdir(parents=True)
+    for name, filepath in cached_files.items():
+        if name == CONVERSION_METADATA_FILENAME: continue
+        out_filepath = output_path / name
+        out_filepath.parent.mkdir(parents=True, exist_ok=True)
+        if out_filepath.name in (INI_FILENAME, NOTES_FILENAME):
+            shutil.copyfile(filepath, out_filepath)
+        else:
+            _link_file(filepath, out_filepath)
+
+    metadata = json.loads(cached_files[CONVERSION_METADATA_FILENAME].read_text())
+    return ConversionResult(
+        output_path=output_path,
+        files=sorted(output_path.iterdir()),
+        title=metadata["title"],
+        artist=metadata["artist"]
+    )
+
+
+def update(
+    gp_source: GPSource,
+    options: ConversionOptions,
+    audio_digest: str | None = None
+) -> tuple[ConversionResult,str]:
+    # Update the output folder in place,
+    # writing the audio files only if the audio does not match the given hash
+    output_path = options.output_path
+    with (
+        GPArchive(gp_source) as archive,
+        tempfile.TemporaryDirectory(prefix=TMP_DIR_PREFIX, dir=options.tmp_dir) as tmp_dir
+    ):
+        tmp_out_dir = Path(tmp_dir) / TMP_OUT_DIRNAME
+        tmp_out_dir.mkdir(parents=True)
+
+        # Convert the GPIF file inside the GP archive to CH charts
+        charts = _create_charts(archive, options)
+        chart = charts[0]
+        chart_folders = _chart_folders(tmp_out_dir, charts)
+        _write_charts(charts, chart_folders)
+
+        # Hash the audio to know whether the audio files are still up to date
+        audio_source = open_audio_source(options.audio_file, archive, chart.embedded_file_path)
+        if audio_source is None:
+            raise FileNotFoundError(
+                "Error: No audio file found in the Guitar Pro file and no valid audio file specified."
+            )
+        try:
+            new_audio_digest = hash_file_source(audio_source)
+        finally:
+            if not isinstance(audio_source, Path):
+                audio_source.close()
+
+        if new_audio_digest != audio_digest:
+            write_audio_files(
+                tmp_out_dir,
+                audio_file=options.audio_file,
+                archive=archive,
+                embedded_file_path=chart.embedded_file_path,
+                split=options.split,
+                stem_cache=_create_stem_cache(options),
+                encode_jobs=options.encode_jobs,
+                max_memory=options.max_memory,
+                drums_only=options.drums_only
+            )
+
+        # The album image does not depend on the GP file
+        if options.image_file is not None and not all(
+            (output_path / chart_folder.relative_to(tmp_out_dir) / ALBUM_FILENAME).exists()
+            for chart_folder in chart_folders
+        ):
+            write_album_image_file(tmp_out_dir / ALBUM_FILENAME, options.image_file)
+        _share_files(tmp_out_dir, chart_folders)
+
+        # Replace the updated files in the output folder
+        for filepath in sorted(tmp_out_dir.rglob("*")):
+            if not filepath.is_file(): continue
+            out_filepath = output_path / filepath.relative_to(tmp_out_dir)
+            out_filepath.parent.mkdir(parents=True, exist_ok=True)
+            shutil.move(filepath, out_filepath)
+
+    result = ConversionResult(
+        output_path=output_path,
+        files=sorted(output_path.iterdir()),
+        title=chart.title,
+        artist=chart.artist
+    )
+    return result, new_audio_digest
+
+
+def watch(gp_file: Path, options: ConversionOptions, interval: float = WATCH_INTERVAL) -> None:
+    # Update the output folder every time the GP file is saved,
+    # until interrupted
+    file_state: tuple[int,int] | None = None                        # (modification time, size) of the converted file
+    audio_digest: str | None = None                                 # hash of the audio in the output folder
+    while True:
+        # The file may be missing for a moment while it is being saved
+        try:
+            stat = gp_file.stat()
+        except FileNotFoundError:
+            time.sleep(interval)
+            continue
+
+        if (stat.st_mtime_ns, stat.st_size) != file_state:
+            file_state = (stat.st_mtime_ns, stat.st_size)
+            start_time = time.perf_counter()
+            try:
+                result, audio_digest = update(gp_file, options, audio_digest)
+            except Exception as error:
+                # Keep watching, the next save may fix it
+                print(f"FAILED {gp_file}: {error}", file=sys.stderr)
+            else:
+                print(f"OK     {gp_file} -> {result.output_path} ({time.perf_counter() - start_time:.2f}s)")
+        time.sleep(interval)
+
+
+def _create_charts(
+    archive: GPArchive,
+    options: ConversionOptions,
+    profiler: Profiler = NO_PROFILER
+) -> list[DrumChart]:
+    with archive.open_gpif() as gpif_file:
+        # Chart the last drum track
+        if not options.drum_tracks:
+            chart = convert_gpif_to_ch_chart(
+                gpif_file,
+                split=options.split,
+                resolution=options.resolution,
+                profiler=profiler,
+                fret_tracks=options.fret_tracks,
+                drums_only=options.drums_only
+            )
+            return [chart]
+
+        # Chart the given drum tracks from a single parse
+        return convert_gpif_to_ch_charts(
+            gpif_file,
+            split=options.split,
+            resolution=options.resolution,
+            profiler=profiler,
+            drum_tracks=list(dict.fromkeys(options.drum_tracks)),
+            fret_tracks=options.fret_tracks,
+            drums_only=options.drums_only
+        )
+
+
+def _chart_folders(folder: Path, charts: list[DrumChart]) -> list[Path]:
+    # Every chart goes to a subfolder of its own if there are several
+    if len(charts) == 1:
+        return [folder]
+    return [folder / DRUM_TRACK_DIRNAME.format(chart.drum_track_id) for chart in charts]
+
+
+def _write_charts(charts: list[DrumChart], chart_folders: list[Path]) -> None:
+    for chart, chart_folder in zip(charts, chart_folders):
+        chart.write_ini_file(chart_folder / INI_FILENAME)
+        chart.write_notes_chart_file(chart_folder / NOTES_FILENAME)
+
+
+def _share_files(folder: Path, chart_folders: list[Path]) -> None:
+    # Link the audio and album image files of the folder into the chart folders
+    if chart_folders == [folder]: return
+    for filepath in list(folder.iterdir()):
+        if not filepath.is_file(): continue
+        for chart_folder in chart_folders:
+            _link_file(filepath, chart_folder / filepath.name)
+        filepath.unlink()
+
+
+def _link_file(filepath: Path, link_path: Path) -> None:
+    # Hard link the file, or copy it if the link is on another file system
+    try:
+        os.link(filepath, link_path)
+    except OSError:
+        shutil.copyfile(filepath, link_path)
+
+
+def _create_stem_cache(options: ConversionOptions) -> FileCache | None:
+    if not options.split or options.stem_cache_dir is None:
+        return None
+    return FileCache(options.stem_cache_dir, options.stem_cache_size)
+
+
+def _write_audio_stage(
+    archive: GPArchive,
+    folder: Path,
+    embedded_file_path: str | None,
+    options: ConversionOptions,
+    stem_cache: FileCache | None,
+    profiler: Profiler = NO_PROFILER
+) -> None:
+    write_audio_files(
+        folder,
+        audio_file=options.audio_file,
+        archive=archive,
+        embedded_file_path=embedded_file_path,
+        split=options.split,
+        stem_cache=stem_cache,
+        encode_jobs=options.encode_jobs,
+        max_memory=options.max_memory,
+        profiler=profiler,
+        drums_only=options.drums_only
+    )
+
+
+def _write_album_image_stage(filepath: Path, image_file: Path, profiler: Profiler = NO_PROFILER) -> None:
+    with profiler.stage("album_image"):
+        write_album_image_file(filepath, image_file)
+
+
+def add_split_argument(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "-s",
+        "--split",
+        default=False,
+        action="store_true",
+        required=False,
+        help="If specified, split the audio using demucs."
+    )
+    parser.add_argument(
+        "--split-mode",
+        type=str,
+        choices=(SPLIT_STEMS, SPLIT_DRUMS),
+        default=SPLIT_STEMS,
+        required=False,
+        help="How to split the audio with --split: into four stems (stems, the default), "
+             "or into the drums and the rest of the song (drums)."
+    )
+
+
+def add_stem_cache_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "--stem-cache",
+        type=str,
+        required=False,
+        default=str(STEM_CACHE_DIR),
+        help="Path to the folder in which split stems are cached."
+    )
+    parser.add_argument(
+        "--stem-cache-size",
+        type=int,
+        required=False,
+        default=STEM_CACHE_SIZE // 1024**2,
+        help="Maximum size of the stem cache in MB."
+    )
+    parser.add_argument(
+        "--no-stem-cache",
+        default=False,
+        action="store_true",
+        required=False,
+        help="If specified, always split the audio instead of using cached stems."
+    )
+    parser.add_argument(
+        "--max-memory",
+        type=int,
+        required=False,
+        help="Memory budget of the audio split in MB. If specified, the audio is split in segments that fit in it."
+    )
+
+
+def add_conversion_cache_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "--cache",
+        type=str,
+        required=False,
+        default=str(CONVERSION_CACHE_DIR),
+        help="Path to the folder in which finished conversions are cached."
+    )
+    parser.add_argument(
+        "--cache-size",
+        type=int,
+        required=False,
+        default=CONVERSION_CACHE_SIZE // 1024**2,
+        help="Maximum size of the conversion cache in MB."
+    )
+    parser.add_argument(
+        "--no-cache",
+        default=False,
+        action="store_true",
+        required=False,
+        help="If specified, always convert the song instead of reusing a cached conversion."
+    )
+
+
+def parse_conversion_cache_arguments(args: argparse.Namespace) -> tuple[Path|None,int]:
+    conversion_cache_dir = None if args.no_cache else Path(args.cache)
+    conversion_cache_size = int(args.cache_size) * 1024**2
+    return conversion_cache_dir, conversion_cache_size
+
+
+def parse_split_argument(args: argparse.Namespace) -> tuple[bool,bool]:
+    # Whether to split the audio, and whether to only split off the drums
+    return args.split, args.split and args.split_mode == SPLIT_DRUMS
+
+
+def parse_stem_cache_arguments(args: argparse.Namespace) -> tuple[Path|None,int,int|None]:
+    stem_cache_dir = None if args.no_stem_cache else Path(args.stem_cache)
+    stem_cache_size = int(args.stem_cache_size) * 1024**2
+    max_memory = int(args.max_memory) * 1024**2 if args.max_memory else None
+    return stem_cache_dir, stem_cache_size, max_memory
+
+
+def _write_profile_report(profiler: Profiler, report_path: str) -> None:
+    if report_path == "-":
+        profiler.write_report(sys.stderr)
+        return
+    with open(report_path, "w") as file:
+        profiler.write_report(file)
 
 
 def main() -> None:
@@ -41,7 +588,7 @@ def main() -> None:
         type=str,
         required=False,
         default=str(DefaultValues.OUTPUT_DIR),
-        help="Path to the folder in which the output folder will be created."
+        help="Path of the output folder that will be created."
     )
     parser.add_argument(
         "-m",
@@ -58,14 +605,53 @@ def main() -> None:
         required=False,
         help="Path to the audio file."
     )
+    add_split_argument(parser)
     parser.add_argument(
-        "-s",
-        "--split",
+        "-r",
+        "--resolution",
+        type=int,
+        choices=CHART_RESOLUTIONS,
+        required=False,
+        default=DefaultValues.SONG_RESOLUTION,
+        help="Resolution of the chart in ticks per quarter note."
+    )
+    parser.add_argument(
+        "-d",
+        "--drum-track",
+        type=int,
+        nargs="+",
+        required=False,
+        help="Indices of the drum tracks to chart. If several are given, each one is charted in a subfolder "
+             "of its own. If not specified, the last drum track is used."
+    )
+    parser.add_argument(
+        "-g",
+        "--guitar-bass",
         default=False,
         action="store_true",
         required=False,
-        help="If specified, split the audio into four stems using demucs."
+        help="If specified, also chart the first guitar and bass tracks."
+    )
+    parser.add_argument(
+        "-w",
+        "--watch",
+        default=False,
+        action="store_true",
+        required=False,
+        help="If specified, keep running and update the output folder every time the Guitar Pro file changes."
+    )
+    parser.add_argument(
+        "--profile",
+        type=str,
+        nargs="?",
+        const="-",
+        required=False,
+        metavar="FILE",
+        help="If specified, write a JSON report of the time, CPU time and memory used by each stage "
+             "to FILE (or to the standard error)."
     )
+    add_stem_cache_arguments(parser)
+    add_conversion_cache_arguments(parser)
     args = parser.parse_args()
 
     # Parse the argments
@@ -73,38 +659,46 @@ def main() -> None:
     output_path = Path(args.output) if args.output else Path(DefaultValues.OUTPUT_DIR)
     image_file = Path(args.image) if args.image else None
     audio_file = Path(args.audio) if args.audio else None
-    split = bool(args.split)
+    split, drums_only = parse_split_argument(args)
+    resolution = int(args.resolution)
+    drum_tracks = [int(drum_track) for drum_track in args.drum_track] if args.drum_track else None
+    fret_tracks = bool(args.guitar_bass)
+    watch_mode = bool(args.watch)
 
-    # Raise an error if the output path already exists
-    if output_path.exists():
-        raise FileExistsError("The output folder already exists. Please rename or remove it.")
+    stem_cache_dir, stem_cache_size, max_memory = parse_stem_cache_arguments(args)
+    conversion_cache_dir, conversion_cache_size = parse_conversion_cache_arguments(args)
 
-    # Extract the GP file to a temporary folder
-    extract_gp(gp_file)
-
-    # Convert the GPIF file inside the GP archive to a CH chart
-    gpif_file = TMP_GP_DIR / GPIF_PATH
-    chart = convert_gpif_to_ch_chart(gpif_file, split=split)
+    # Convert the GP file
+    options = ConversionOptions(
+        output_path,
+        image_file=image_file,
+        audio_file=audio_file,
+        split=split,
+        drums_only=drums_only,
+        resolution=resolution,
+        drum_tracks=drum_tracks,
+        fret_tracks=fret_tracks,
+        stem_cache_dir=stem_cache_dir,
+        stem_cache_size=stem_cache_size,
+        max_memory=max_memory,
+        conversion_cache_dir=conversion_cache_dir,
+        conversion_cache_size=conversion_cache_size
+    )
+    if not watch_mode:
+        profiler = Profiler() if args.profile else NO_PROFILER
+        try:
+            convert(gp_file, options, profiler)
+        finally:
+            if args.profile:
+                _write_profile_report(profiler, args.profile)
+        return
 
-    # Create the CH output
+    # Update the output folder until Ctrl+C is pressed
+    print(f"Watching {gp_file} for changes (press Ctrl+C to stop)...")
     try:
-        TMP_OUT_DIR.mkdir(parents=True, exist_ok=False)
-    except OSError:
-        raise OSError("A 'tmp' folder already exists, please delete it and try again.")
-    chart.write_ini_file(TMP_OUT_DIR / INI_FILENAME)
-    chart.write_notes_chart_file(TMP_OUT_DIR / NOTES_FILENAME)
-    chart.write_audio_files(TMP_OUT_DIR, audio_file=audio_file)
-    if image_file is not None:
-        chart.write_album_image_file(
-            TMP_OUT_DIR / ALBUM_FILENAME,
-            image_file
-        )
-
-    # Copy the output folder to the cwd
-    shutil.move(TMP_OUT_DIR, output_path.parent)
-
-    # Remove the tmp dir
-    shutil.rmtree(TMP_DIR)
+        watch(gp_file, options)
+    except KeyboardInterrupt:
+        pass
 
 
 if __name__ == "__main__":
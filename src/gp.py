@@ -1,11 +1,27 @@
 from typing_extensions import override
 
+from typing import IO, Any, Callable
+
 from enum import IntEnum, StrEnum, auto
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from fractions import Fraction
 from pathlib import Path
-from zipfile import ZipFile
+from array import array
+from zipfile import ZipFile, ZipInfo, ZIP_STORED
+import xml.etree.ElementTree as ET
+import io
+import mmap
+import struct
+import threading
+
+import numpy as np
 
-from .const import TMP_GP_DIR
+from .const import (
+    GPIF_PATH,
+    GP_INVALID_VOICE,
+    GP_RHYTHM_DICT,
+    GP_DEFAULT_DYNAMIC
+)
 
 
 class Accent(IntEnum):
@@ -18,15 +34,6 @@ class AntiAccent(StrEnum):
     NONE       = ""
     GHOST_NOTE = "Normal"
 
-@dataclass
-class Note:
-    note_id: int
-    midi: int
-    tied: bool
-    accent: Accent
-    anti_accent: AntiAccent
-
-
 class GraceNoteType(StrEnum):
     NONE        = ""
     BEFORE_BEAT = "BeforeBeat"
@@ -46,26 +53,630 @@ class Dynamic(IntEnum):
     def __str__(self) -> str:
         return self.name
 
+# String enums are stored in the score columns by their index in these tuples
+ANTI_ACCENTS: tuple[AntiAccent,...] = tuple(AntiAccent)
+GRACE_NOTE_TYPES: tuple[GraceNoteType,...] = tuple(GraceNoteType)
+
+# Lists of ids stored back to back (CSR-style):
+# the list of row id is values[offsets[id]:offsets[id+1]]
+@dataclass
+class IdLists:
+    offsets: np.ndarray = field(default_factory=lambda: np.zeros(1, dtype=np.int64))
+    values: np.ndarray = field(default_factory=lambda: np.zeros(0, dtype=np.int64))
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def get(self, row_id: int) -> np.ndarray:
+        if not 0 <= row_id < len(self): return self.values[:0]
+        return self.values[self.offsets[row_id]:self.offsets[row_id + 1]]
+
+    def select(self, row_ids: np.ndarray) -> "IdLists":
+        # Lists of the given rows, in that order (rows out of range are empty)
+        row_ids = np.asarray(row_ids, dtype=np.int64)
+        valid = (row_ids >= 0) & (row_ids < len(self))
+        starts = np.zeros(len(row_ids), dtype=np.int64)
+        lengths = np.zeros(len(row_ids), dtype=np.int64)
+        starts[valid] = self.offsets[row_ids[valid]]
+        lengths[valid] = self.offsets[row_ids[valid] + 1] - starts[valid]
+        offsets = np.zeros(len(row_ids) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+
+        # Gather the lists back to back
+        gather = np.repeat(starts - offsets[:-1], lengths) + np.arange(offsets[-1])
+        return IdLists(offsets, self.values[gather])
+
+    def value_rows(self) -> np.ndarray:
+        # Row of every value
+        return np.repeat(np.arange(len(self)), np.diff(self.offsets))
+
+
+def _column(dtype: type) -> Any:
+    return field(default_factory=lambda: np.zeros(0, dtype=dtype))
+
 @dataclass
-class Beat:
-    beat_id: int
-    notes: list[Note]
-    rhythm: float
-    dynamic: Dynamic
-    grace_note_type: GraceNoteType
-
-
-def extract_gp(gp_file: Path) -> None:
-    # Check if the file is valid
-    if not gp_file.exists():
-        raise FileNotFoundError(f"Error: {gp_file} does not exist.")
-    # Check if it is a file
-    if not gp_file.is_file():
-        raise FileNotFoundError(f"Error: {gp_file} is not a file.")
-    # Check if it is a .gp file
-    if gp_file.suffix != ".gp":
-        raise ValueError(f"Error: {gp_file} is not a .gp file.")
-
-    # Extract the .gp file
-    with ZipFile(gp_file, 'r') as zip_file:
-        zip_file.extractall(TMP_GP_DIR)
+class GPScore:
+    title: str = ""
+    artist: str = ""
+    album: str = ""
+    charter: str = ""
+    default_tempo: int | None = None                                                # default bpm (if any)
+    embedded_file_path: str | None = None                                           # path of the embedded audio file
+    has_anacrusis: bool = False                                                     # True if there is an anacrusis
+    tempo_data: list[tuple[Fraction,float]] = field(default_factory=list)           # (master bar position, bpm)
+    track_types: dict[int,str] = field(default_factory=dict)                        # track id -> instrument set type
+    track_num_staves: dict[int,int] = field(default_factory=dict)                   # track id -> number of staves
+    rhythm_data: dict[int,Fraction] = field(default_factory=dict)                   # rhythm id -> rhythm value
+    note_midi: np.ndarray = _column(np.int16)                                       # midi number of each note id (-1 if missing)
+    note_tied: np.ndarray = _column(np.bool_)                                       # True if the note is tied
+    note_accent: np.ndarray = _column(np.int8)                                      # Accent value
+    note_anti_accent: np.ndarray = _column(np.int8)                                 # index in ANTI_ACCENTS
+    beat_rhythm: np.ndarray = _column(np.int32)                                     # rhythm id of each beat id (-1 if missing)
+    beat_dynamic: np.ndarray = _column(np.int8)                                     # Dynamic value
+    beat_grace_note_type: np.ndarray = _column(np.int8)                             # index in GRACE_NOTE_TYPES
+    beat_notes: IdLists = field(default_factory=IdLists)                            # beat id -> list of note ids
+    voice_beats: IdLists = field(default_factory=IdLists)                           # voice id -> list of beat ids
+    bar_voices: IdLists = field(default_factory=IdLists)                            # bar id -> list of voice ids
+    master_bar_data: list[list[int]] = field(default_factory=list)                  # master bar id -> list of bar ids
+    time_signature_data: list[tuple[int,int,int]] = field(default_factory=list)     # (master bar id, numerator, denominator)
+    section_data: list[tuple[int,str]] = field(default_factory=list)                # (master bar id, section name)
+
+# A .gp archive as a file path, its raw bytes or a binary file object
+GPSource = Path | bytes | IO[bytes]
+
+# Local file header of a zip member: signature, ..., file name length, extra field length
+_ZIP_LOCAL_HEADER_FORMAT = "<I22xHH"
+_ZIP_LOCAL_HEADER_SIZE = struct.calcsize(_ZIP_LOCAL_HEADER_FORMAT)
+_ZIP_LOCAL_HEADER_SIGNATURE = 0x04034b50
+
+
+# Read-only file object over a stored (uncompressed) archive member
+class EmbeddedFile(io.RawIOBase):
+    def __init__(self, view: memoryview) -> None:
+        super().__init__()
+        self._view = view
+        self._position = 0
+
+    @override
+    def close(self) -> None:
+        self._view.release()
+        super().close()
+
+    @override
+    def readable(self) -> bool:
+        return True
+
+    @override
+    def seekable(self) -> bool:
+        return True
+
+    @override
+    def readinto(self, buffer: Any) -> int:
+        size = min(len(buffer), len(self._view) - self._position)
+        if size <= 0: return 0
+        buffer[:size] = self._view[self._position:self._position + size]
+        self._position += size
+        return size
+
+    @override
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        match whence:
+            case io.SEEK_SET:
+                self._position = offset
+            case io.SEEK_CUR:
+                self._position += offset
+            case io.SEEK_END:
+                self._position = len(self._view) + offset
+            case _:
+                raise ValueError(f"Invalid whence ({whence}).")
+        self._position = max(self._position, 0)
+        return self._position
+
+    @override
+    def tell(self) -> int:
+        return self._position
+
+
+# Reads the members of a .gp archive in place, without extracting it
+class GPArchive:
+    def __init__(self, gp_source: GPSource) -> None:
+        self._gp_file: Path | None = None
+        self._buffer: bytes | mmap.mmap | None = None
+        self._mmap: mmap.mmap | None = None
+        self._lock = threading.Lock()                               # members may be opened from several threads
+        if isinstance(gp_source, Path):
+            # Check if the file is valid
+            if not gp_source.exists():
+                raise FileNotFoundError(f"Error: {gp_source} does not exist.")
+            # Check if it is a file
+            if not gp_source.is_file():
+                raise FileNotFoundError(f"Error: {gp_source} is not a file.")
+            # Check if it is a .gp file
+            if gp_source.suffix != ".gp":
+                raise ValueError(f"Error: {gp_source} is not a .gp file.")
+
+            self._name = str(gp_source)
+            self._gp_file = gp_source
+            self._zip_file = ZipFile(gp_source, 'r')
+        elif isinstance(gp_source, bytes):
+            self._name = "<bytes>"
+            self._buffer = gp_source
+            self._zip_file = ZipFile(io.BytesIO(gp_source), 'r')
+        else:
+            self._name = str(getattr(gp_source, "name", "<file>"))
+            self._zip_file = ZipFile(gp_source, 'r')
+
+    def __enter__(self) -> "GPArchive":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    @property
+    def name(self) -> str:
+        return self._name
+
+    def close(self) -> None:
+        self._zip_file.close()
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        self._buffer = None
+
+    def has_member(self, name: str) -> bool:
+        try:
+            self._zip_file.getinfo(name)
+        except KeyError:
+            return False
+        return True
+
+    def open_gpif(self) -> IO[bytes]:
+        return self.open_member(GPIF_PATH.as_posix())
+
+    def open_member(self, name: str) -> IO[bytes]:
+        with self._lock:
+            info = self._zip_file.getinfo(name)
+
+            # Stored members are exposed as a view on the archive itself,
+            # compressed members are decompressed while they are read
+            if info.compress_type == ZIP_STORED and not info.flag_bits & 0x1:
+                view = self._member_view(info)
+                if view is not None:
+                    return io.BufferedReader(EmbeddedFile(view))
+            return self._zip_file.open(info)
+
+    def _member_view(self, info: ZipInfo) -> memoryview | None:
+        # Map the archive file into memory the first time it is needed
+        if self._buffer is None and self._gp_file is not None:
+            with open(self._gp_file, "rb") as file:
+                self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            self._buffer = self._mmap
+        if self._buffer is None:
+            return None
+
+        # Skip the local file header to find the start of the member data
+        header = self._buffer[info.header_offset:info.header_offset + _ZIP_LOCAL_HEADER_SIZE]
+        signature, name_length, extra_length = struct.unpack(_ZIP_LOCAL_HEADER_FORMAT, header)
+        if signature != _ZIP_LOCAL_HEADER_SIGNATURE:
+            raise ValueError(f"Error: {self._name} has an invalid header for {info.filename}.")
+        start = info.header_offset + _ZIP_LOCAL_HEADER_SIZE + name_length + extra_length
+        return memoryview(self._buffer)[start:start + info.compress_size]
+
+
+# Records of one element type in document order:
+# a column per typecode, and optionally a list of ids per record stored back to back
+class _Records:
+    def __init__(self, *typecodes: str) -> None:
+        self._ids = array("q")
+        self._columns = tuple(array(typecode) for typecode in typecodes)
+        self._list_lengths = array("q")
+        self._list_values = array("q")
+
+    def append(self, record_id: int, *values: int, id_list: list[int] | None = None) -> None:
+        self._ids.append(record_id)
+        for column, value in zip(self._columns, values):
+            column.append(value)
+        if id_list is not None:
+            self._list_lengths.append(len(id_list))
+            self._list_values.extend(id_list)
+
+    def max_id(self) -> int:
+        return max(self._ids, default=-1)
+
+    def max_list_value(self) -> int:
+        return max(self._list_values, default=-1)
+
+    def _latest_records(self) -> tuple[np.ndarray,np.ndarray]:
+        # Index of the last record of every id, sorted by id
+        ids = np.asarray(self._ids, dtype=np.int64)
+        unique_ids, reversed_idx = np.unique(ids[::-1], return_index=True)
+        return unique_ids, len(ids) - 1 - reversed_idx
+
+    def columns(self, size: int, fills: tuple[int,...], dtypes: tuple[type,...]) -> list[np.ndarray]:
+        # Dense columns indexed by id
+        ids, records = self._latest_records()
+        dense_columns: list[np.ndarray] = []
+        for column, fill, dtype in zip(self._columns, fills, dtypes):
+            dense_column = np.full(size, fill, dtype=dtype)
+            dense_column[ids] = np.asarray(column)[records]
+            dense_columns.append(dense_column)
+        return dense_columns
+
+    def id_lists(self, size: int) -> IdLists:
+        ids, records = self._latest_records()
+        lengths = np.asarray(self._list_lengths, dtype=np.int64)
+        values = np.asarray(self._list_values, dtype=np.int64)
+        starts = np.cumsum(lengths) - lengths
+
+        # Offsets of the lists when they are sorted by id
+        dense_lengths = np.zeros(size, dtype=np.int64)
+        dense_lengths[ids] = lengths[records]
+        offsets = np.zeros(size + 1, dtype=np.int64)
+        np.cumsum(dense_lengths, out=offsets[1:])
+
+        # Gather the lists in that order
+        gather = np.repeat(starts[records] - offsets[ids], lengths[records]) + np.arange(offsets[-1])
+        return IdLists(offsets, values[gather])
+
+
+class GPIFParser:
+    def __init__(self) -> None:
+        self._score = GPScore()
+
+        # Parsed records in document order, turned into score columns at the end
+        self._note_records = _Records("h", "b", "b", "b")           # midi, tied, accent, anti-accent
+        self._beat_records = _Records("i", "b", "b")                # rhythm id, dynamic, grace note type
+        self._voice_records = _Records()
+        self._bar_records = _Records()
+
+        # (container tag, element tag) -> parse method
+        self._record_parsers: dict[tuple[str,str], Callable[[ET.Element], None]] = {
+            ("Tracks",  "Track"):  self._parse_track,
+            ("Bars",    "Bar"):    self._parse_bar,
+            ("Voices",  "Voice"):  self._parse_voice,
+            ("Beats",   "Beat"):   self._parse_beat,
+            ("Notes",   "Note"):   self._parse_note,
+            ("Rhythms", "Rhythm"): self._parse_rhythm,
+        }
+
+    def parse(self, source: Path | IO[bytes]) -> GPScore:
+        # Stream the GPIF document in a single pass,
+        # discarding every element as soon as it has been handled
+        stack: list[ET.Element] = []
+        for event, element in ET.iterparse(source, events=("start", "end")):
+            if event == "start":
+                stack.append(element)
+                continue
+            stack.pop()
+            parent = stack[-1] if stack else None
+            if parent is None: continue
+
+            # Elements that are looked up anywhere in the document
+            match element.tag:
+                case "Anacrusis":
+                    self._score.has_anacrusis = True
+                case "EmbeddedFilePath":
+                    if self._score.embedded_file_path is None:
+                        self._score.embedded_file_path = element.text
+                case "Automation":
+                    self._parse_automation(element)
+                    self._discard_element(element, parent)
+                    continue
+                case "MasterBar":
+                    self._parse_master_bar(element)
+                    self._discard_element(element, parent)
+                    continue
+                case "Score":
+                    self._parse_score(element)
+
+            # Elements that are looked up in their container
+            parse_method = self._record_parsers.get((parent.tag, element.tag), None)
+            if parse_method is not None:
+                parse_method(element)
+                self._discard_element(element, parent)
+                continue
+
+            # Drop the top-level sections once they are done
+            if len(stack) == 1:
+                self._discard_element(element, parent)
+
+        # Store the notes, beats, voices and bars as columns
+        self._build_columns()
+
+        return self._score
+
+    def _discard_element(self, element: ET.Element, parent: ET.Element) -> None:
+        element.clear()
+        parent.remove(element)
+
+    def _build_columns(self) -> None:
+        score = self._score
+
+        # Make room for every id that is defined or referenced
+        master_bar_bar_ids = [bar_id for bar_ids in score.master_bar_data for bar_id in bar_ids]
+        num_bars = max(self._bar_records.max_id(), max(master_bar_bar_ids, default=-1)) + 1
+        num_voices = max(self._voice_records.max_id(), self._bar_records.max_list_value()) + 1
+        num_beats = max(self._beat_records.max_id(), self._voice_records.max_list_value()) + 1
+        num_notes = max(self._note_records.max_id(), self._beat_records.max_list_value()) + 1
+
+        # Notes
+        score.note_midi, score.note_tied, score.note_accent, score.note_anti_accent = self._note_records.columns(
+            num_notes,
+            (-1, False, Accent.NONE, ANTI_ACCENTS.index(AntiAccent.NONE)),
+            (np.int16, np.bool_, np.int8, np.int8)
+        )
+
+        # Beats (without a rhythm if the rhythm is unknown)
+        score.beat_rhythm, score.beat_dynamic, score.beat_grace_note_type = self._beat_records.columns(
+            num_beats,
+            (-1, Dynamic[GP_DEFAULT_DYNAMIC], GRACE_NOTE_TYPES.index(GraceNoteType.NONE)),
+            (np.int32, np.int8, np.int8)
+        )
+        score.beat_rhythm[~np.isin(score.beat_rhythm, list(score.rhythm_data))] = -1
+
+        # Beat -> notes, voice -> beats and bar -> voices
+        score.beat_notes = self._beat_records.id_lists(num_beats)
+        score.voice_beats = self._voice_records.id_lists(num_voices)
+        score.bar_voices = self._bar_records.id_lists(num_bars)
+
+    def _parse_score(self, score_element: ET.Element) -> None:
+        # Title
+        title_element = score_element.find("Title")
+        if title_element is not None and title_element.text:
+            self._score.title = title_element.text
+
+        # Artist
+        artist_element = score_element.find("Artist")
+        if artist_element is not None and artist_element.text:
+            self._score.artist = artist_element.text
+
+        # Album
+        album_element = score_element.find("Album")
+        if album_element is not None and album_element.text:
+            self._score.album = album_element.text
+
+        # Charter
+        charter_element = score_element.find("Tabber")
+        if charter_element is not None and charter_element.text:
+            self._score.charter = charter_element.text
+
+        # Default tempo
+        tempo_element = score_element.find("Properties/Tempo")
+        if tempo_element is not None and tempo_element.text:
+            self._score.default_tempo = int(tempo_element.text.split()[0])
+
+
+    def _parse_automation(self, automation: ET.Element) -> None:
+        # Inspired by https://github.com/lmeullibre/gp-metronome-extractor
+        if automation.findtext("Type") != "Tempo": return
+
+        # Get the bar number
+        bar_element = automation.find("Bar")
+        if bar_element is None: return
+        bar_text = bar_element.text
+        if bar_text is None: return
+        bar = int(bar_text)
+
+        # Get the position in the bar
+        position_element = automation.find("Position")
+        if position_element is None: return
+        position_text = position_element.text
+        if position_text is None: return
+        position = Fraction(position_text)
+
+        # Get the tempo value
+        value_element = automation.find("Value")
+        if value_element is None: return
+        value_text = value_element.text
+        if value_text is None: return
+        tempo_value = value_text.split()[0]
+        bpm = float(tempo_value)
+
+        # Append the tempo to the list
+        self._score.tempo_data.append((bar + position, bpm))
+
+
+    def _parse_track(self, track_element: ET.Element) -> None:
+        # Get the id
+        track_id = int(track_element.get("id", -1))
+        if track_id < 0: return
+
+        # Get the instrument type
+        instrumentset_type_element = track_element.find("InstrumentSet/Type")
+        if instrumentset_type_element is None: return
+        self._score.track_types[track_id] = instrumentset_type_element.text or ""
+
+        # Get the number of staves
+        staff_elements = track_element.findall("Staves/Staff")
+        self._score.track_num_staves[track_id] = len(staff_elements)
+
+
+    def _parse_master_bar(self, master_bar_element: ET.Element) -> None:
+        master_bar = len(self._score.master_bar_data)
+
+        # Time signature
+        time_signature_element = master_bar_element.find("Time")
+        if time_signature_element is not None:
+            time_signature = time_signature_element.text
+            if time_signature is not None:
+                numer, denom = map(int, time_signature.split("/"))
+                self._score.time_signature_data.append((master_bar, numer, denom))
+
+        # Section name
+        section_element = master_bar_element.find("Section/Text")
+        if section_element is not None:
+            section_name = section_element.text
+            if section_name:
+                section_name = section_name.replace("\n", "")
+                self._score.section_data.append((master_bar, section_name))
+
+        # Bar ids (one per staff of each track)
+        bar_ids: list[int] = []
+        bars_text = master_bar_element.findtext("Bars")
+        if bars_text:
+            bar_ids = [int(bar_id_text) for bar_id_text in bars_text.split()]
+        self._score.master_bar_data.append(bar_ids)
+
+
+    def _parse_bar(self, bar_element: ET.Element) -> None:
+        # Get the bar number
+        bar_number = int(bar_element.get("id", -1))
+        if bar_number < 0: return
+
+        # Get the voice ids
+        voices_element = bar_element.find("Voices")
+        if voices_element is None: return
+        voices_text = voices_element.text
+        if voices_text is None: return
+        voice_ids = [
+            int(voice_str)
+            for voice_str in voices_text.split()
+            if voice_str != str(GP_INVALID_VOICE)
+        ]
+
+        # Save the the voice ids in the bar data
+        self._bar_records.append(bar_number, id_list=voice_ids)
+
+
+    def _parse_voice(self, voice_element: ET.Element) -> None:
+        # Get the id
+        voice_id = int(voice_element.get("id", -1))
+        if voice_id < 0: return
+
+        # Get the beat ids
+        beats_element = voice_element.find("Beats")
+        if beats_element is None: return
+        beat_ids_text = beats_element.text
+        if beat_ids_text is None: return
+        beat_ids = [int(beat_str) for beat_str in beat_ids_text.split()]
+
+        # Save the the beat ids in the voice data
+        self._voice_records.append(voice_id, id_list=beat_ids)
+
+
+    def _parse_beat(self, beat_element: ET.Element) -> None:
+        # Get the id
+        beat_id = int(beat_element.get("id", -1))
+        if beat_id < 0: return
+
+        # Get the rhythm id
+        rhythm_element = beat_element.find("Rhythm")
+        if rhythm_element is None: return
+        rhythm_id = int(rhythm_element.get("ref", -1))
+        if rhythm_id < 0: return
+
+        # Get the note ids (empty for rests)
+        note_ids: list[int] = []
+        notes_text = beat_element.findtext("Notes")
+        if notes_text:
+            note_ids = [int(note_str) for note_str in notes_text.split()]
+
+        # Get the grace note type
+        grace_note_type = GraceNoteType.NONE
+        grace_note_text = beat_element.findtext("GraceNotes")
+        if grace_note_text is not None:
+            try:
+                grace_note_type = GraceNoteType(grace_note_text)
+            except ValueError:
+                pass
+
+        # Get the dynamic
+        dynamic = Dynamic[GP_DEFAULT_DYNAMIC]
+        dynamic_text = beat_element.findtext("Dynamic")
+        if dynamic_text is not None:
+            try:
+                dynamic = Dynamic[dynamic_text]
+            except KeyError:
+                pass
+
+        # Save the beat
+        self._beat_records.append(
+            beat_id, rhythm_id, dynamic, GRACE_NOTE_TYPES.index(grace_note_type),
+            id_list=note_ids
+        )
+
+
+    def _parse_note(self, note_element: ET.Element) -> None:
+        # Get the id
+        note_id = int(note_element.get("id", -1))
+        if note_id < 0: return
+
+        # Get the midi note
+        midi_note_element = note_element.find("Properties/Property[@name='Midi']/Number")
+        if midi_note_element is None: return
+        midi_note_text = midi_note_element.text
+        if midi_note_text is None: return
+        midi_note = int(midi_note_text)
+
+        # Check if it's a tied note
+        tied_note = False
+        tie_element = note_element.find("Tie")
+        if tie_element is not None:
+            tie_destination = tie_element.get("destination", "false")
+            if tie_destination == "true":
+                tied_note = True
+
+        # Parse the accent
+        accent = Accent.NONE
+        accent_text = note_element.findtext("Accent")
+        if accent_text is not None:
+            accent = Accent(int(accent_text))
+
+        # Parse the anti-accent
+        anti_accent = AntiAccent.NONE
+        anti_accent_text = note_element.findtext("AntiAccent")
+        if anti_accent_text is not None:
+            anti_accent = AntiAccent(anti_accent_text)
+
+        # Save the note
+        self._note_records.append(note_id, midi_note, tied_note, accent, ANTI_ACCENTS.index(anti_accent))
+
+
+    def _parse_rhythm(self, rhythm_element: ET.Element) -> None:
+        # Get the id
+        rhythm_id = int(rhythm_element.get("id", -1))
+        if rhythm_id < 0: return
+
+        # Get the rhythm value
+        value_text = rhythm_element.findtext("NoteValue")
+        if value_text is None: return
+        note_value = GP_RHYTHM_DICT.get(value_text, None)
+        if note_value is None: return
+        rhythm_value = Fraction(note_value)
+
+        # Get the tuplet kind
+        tuplet_element = rhythm_element.find("PrimaryTuplet")
+        if tuplet_element is not None:
+            tuplet_numer_text = tuplet_element.get("num", "1")
+            tuplet_denom_text = tuplet_element.get("den", "1")
+            try:
+                tuplet_numer = int(tuplet_numer_text)
+                tuplet_denom = int(tuplet_denom_text)
+
+                # Adjust the rhythm value
+                rhythm_value *= Fraction(tuplet_numer, tuplet_denom)
+            except (ValueError, ZeroDivisionError):
+                pass
+
+        # Handle dotted notes
+        dot_element = rhythm_element.find("AugmentationDot")
+        if dot_element is not None:
+            dot_count_text = dot_element.get("count", "0")
+            try:
+                dot_count = int(dot_count_text)
+
+                # Adjust the rhythm value
+                factor = Fraction(1)
+                for i in range(dot_count):
+                    factor += Fraction(1, 2**(i+1))
+                rhythm_value /= factor
+            except ValueError:
+                pass
+
+        self._score.rhythm_data[rhythm_id] = rhythm_value
+
+
+def parse_gpif(source: Path | IO[bytes]) -> GPScore:
+    parser = GPIFParser()
+    return parser.parse(source)
+
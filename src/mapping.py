@@ -1,4 +1,7 @@
 from enum import IntEnum
+from typing import Iterable, NamedTuple
+
+from .gp import Accent
 
 
 class GPMidiNote(IntEnum):
@@ -122,6 +125,13 @@ class CHMidiNote(IntEnum):
 CH_NOTE_TO_ACCENT = 33
 CH_NOTE_TO_GHOST  = 39
 
+class CHFret(IntEnum):
+    GREEN  = 0
+    RED    = 1
+    YELLOW = 2
+    BLUE   = 3
+    ORANGE = 4
+
 
 DRUMS_GP_TO_CH_MAPPING: dict[GPMidiNote,list[CHMidiNote]] = {
     GPMidiNote.KICK: [CHMidiNote.KICK],
@@ -228,3 +238,140 @@ DRUMS_GP_TO_CH_MAPPING: dict[GPMidiNote,list[CHMidiNote]] = {
     GPMidiNote.BELL_TREE: [CHMidiNote.GREEN, CHMidiNote.GREEN_CYMBAL],
     GPMidiNote.BELL_TREE_RETURN: [CHMidiNote.GREEN, CHMidiNote.GREEN_CYMBAL],
 }
+
+
+def fret_lanes(midi_notes: Iterable[int]) -> dict[int,CHFret]:
+    # Spread the distinct pitches from low to high over the frets,
+    # squeezing them together if there are more pitches than frets
+    pitches = sorted(set(midi_notes))
+    num_frets = len(CHFret)
+    if len(pitches) <= num_frets:
+        return {pitch: CHFret(rank) for rank, pitch in enumerate(pitches)}
+    return {pitch: CHFret(rank * num_frets // len(pitches)) for rank, pitch in enumerate(pitches)}
+
+
+# Accent levels: how many times the intensity of the CH notes is increased
+DRUMS_ACCENT_LEVELS: dict[Accent,int] = {
+    Accent.ACCENT:       1,
+    Accent.HEAVY_ACCENT: 2,     # max out intensity
+    Accent.STACCATO:     2,     # max out intensity
+}
+
+# Dynamic levels: softer than, equal to or louder than the default dynamic
+DRUMS_DYNAMIC_SOFTER = 0
+DRUMS_DYNAMIC_DEFAULT = 1
+DRUMS_DYNAMIC_LOUDER = 2
+
+_NUM_MIDI_NOTES = 128
+_NUM_ACCENT_LEVELS = 3
+_NUM_DYNAMIC_LEVELS = 3
+
+
+def drums_table_index(midi: int, ghost: bool, accent_level: int, dynamic_level: int) -> int:
+    return ((midi * 2 + ghost) * _NUM_ACCENT_LEVELS + accent_level) * _NUM_DYNAMIC_LEVELS + dynamic_level
+
+
+def _decrease_ch_notes_intensity(ch_notes: list[CHMidiNote]) -> None:
+    # Decrease the intensity by removing accents or adding ghost notes
+    for note in range(CHMidiNote.RED, CHMidiNote.GREEN + 1):
+        if note not in ch_notes: continue
+        accent = CHMidiNote(note + CH_NOTE_TO_ACCENT)
+        ghost = CHMidiNote(note + CH_NOTE_TO_GHOST)
+        if accent in ch_notes:
+            ch_notes.remove(accent)
+        elif ghost not in ch_notes:
+            ch_notes.append(ghost)
+
+
+def _increase_ch_notes_intensity(ch_notes: list[CHMidiNote]) -> None:
+    # Increase the intensity by adding accents or removing ghost notes
+    for note in range(CHMidiNote.RED, CHMidiNote.GREEN + 1):
+        if note not in ch_notes: continue
+        accent = CHMidiNote(note + CH_NOTE_TO_ACCENT)
+        ghost = CHMidiNote(note + CH_NOTE_TO_GHOST)
+        if ghost in ch_notes:
+            ch_notes.remove(ghost)
+        elif accent not in ch_notes:
+            ch_notes.append(accent)
+
+
+def _create_drums_table() -> list[tuple[CHMidiNote,...] | None]:
+    table: list[tuple[CHMidiNote,...] | None] = [None] * drums_table_index(_NUM_MIDI_NOTES, False, 0, 0)
+    for gp_note, base_ch_notes in DRUMS_GP_TO_CH_MAPPING.items():
+        for ghost in (False, True):
+            for accent_level in range(_NUM_ACCENT_LEVELS):
+                for dynamic_level in range(_NUM_DYNAMIC_LEVELS):
+                    ch_notes = base_ch_notes.copy()
+
+                    # Handle anti-accents
+                    if ghost:
+                        _decrease_ch_notes_intensity(ch_notes)
+
+                    # Handle accents
+                    for _ in range(accent_level):
+                        _increase_ch_notes_intensity(ch_notes)
+
+                    # Handle the beat dynamic
+                    if dynamic_level == DRUMS_DYNAMIC_SOFTER:
+                        _decrease_ch_notes_intensity(ch_notes)
+                    elif dynamic_level == DRUMS_DYNAMIC_LOUDER:
+                        _increase_ch_notes_intensity(ch_notes)
+
+                    table[drums_table_index(gp_note, ghost, accent_level, dynamic_level)] = tuple(ch_notes)
+    return table
+
+
+# CH notes of every GP note with every combination of intensity changes,
+# indexed by drums_table_index (None for unmapped notes)
+DRUMS_GP_TO_CH_TABLE = _create_drums_table()
+
+
+class DrumsDifficulty(IntEnum):
+    EASY   = 0
+    MEDIUM = 1
+    HARD   = 2
+    EXPERT = 3
+
+# Kind of every CH note: a hit on a lane or a marker that changes the hit on its lane
+class CHNoteKind(IntEnum):
+    HIT    = 0
+    KICK2  = 1
+    ACCENT = 2
+    GHOST  = 3
+    CYMBAL = 4
+
+class DrumsReduction(NamedTuple):
+    hand_division: int                  # hand notes are kept on this grid (notes per whole note)
+    kick_division: int                  # kicks are kept on this grid (notes per whole note)
+    max_hand_lanes: int                 # hand lanes kept per tick (snare first, then cymbals, then toms)
+    double_kick: bool                   # False to drop the second kick
+    dynamics: bool                      # False to drop the accents and the ghost notes
+
+# How the lower difficulties are reduced from the expert notes
+DRUMS_REDUCTIONS: dict[DrumsDifficulty,DrumsReduction] = {
+    DrumsDifficulty.HARD:   DrumsReduction(16, 8, 2, False, True),
+    DrumsDifficulty.MEDIUM: DrumsReduction(8,  4, 2, False, False),
+    DrumsDifficulty.EASY:   DrumsReduction(4,  2, 1, False, False),
+}
+
+# Lane (0 for the kick) and kind of every CH note
+CH_NOTE_LANES: dict[CHMidiNote,tuple[int,CHNoteKind]] = {
+    CHMidiNote.KICK:          (0, CHNoteKind.HIT),
+    CHMidiNote.RED:           (1, CHNoteKind.HIT),
+    CHMidiNote.YELLOW:        (2, CHNoteKind.HIT),
+    CHMidiNote.BLUE:          (3, CHNoteKind.HIT),
+    CHMidiNote.GREEN:         (4, CHNoteKind.HIT),
+    CHMidiNote.KICK2:         (0, CHNoteKind.KICK2),
+    CHMidiNote.RED_ACCENT:    (1, CHNoteKind.ACCENT),
+    CHMidiNote.YELLOW_ACCENT: (2, CHNoteKind.ACCENT),
+    CHMidiNote.BLUE_ACCENT:   (3, CHNoteKind.ACCENT),
+    CHMidiNote.GREEN_ACCENT:  (4, CHNoteKind.ACCENT),
+    CHMidiNote.RED_GHOST:     (1, CHNoteKind.GHOST),
+    CHMidiNote.YELLOW_GHOST:  (2, CHNoteKind.GHOST),
+    CHMidiNote.BLUE_GHOST:    (3, CHNoteKind.GHOST),
+    CHMidiNote.GREEN_GHOST:   (4, CHNoteKind.GHOST),
+    CHMidiNote.ORANGE_GHOST:  (5, CHNoteKind.GHOST),
+    CHMidiNote.YELLOW_CYMBAL: (2, CHNoteKind.CYMBAL),
+    CHMidiNote.BLUE_CYMBAL:   (3, CHNoteKind.CYMBAL),
+    CHMidiNote.GREEN_CYMBAL:  (4, CHNoteKind.CYMBAL),
+}
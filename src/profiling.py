@@ -0,0 +1,103 @@
+import json
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, asdict
+from typing import IO, Any, Iterator
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+@dataclass
+class StageProfile:
+    name: str
+    thread: str                                                     # name of the thread that ran the stage
+    wall_time: float                                                # seconds
+    cpu_time: float                                                 # seconds of CPU used by that thread
+    max_rss: int | None                                             # peak resident memory of the process so far in bytes
+
+
+# Wall time, CPU time and memory of the stages of a conversion, and counters of what they processed
+# (stages may run at the same time in different threads)
+class Profiler:
+    def __init__(self, enabled: bool = True) -> None:
+        self._enabled = enabled
+        self._lock = threading.Lock()
+        self._start_wall_time = time.perf_counter()
+        self._start_cpu_time = time.process_time()
+        self._stages: list[StageProfile] = []
+        self._counters: dict[str,int] = {}
+        self._values: dict[str,Any] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return self._enabled
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        if not self._enabled:
+            yield
+            return
+
+        start_wall_time = time.perf_counter()
+        start_cpu_time = time.thread_time()
+        try:
+            yield
+        finally:
+            stage = StageProfile(
+                name=name,
+                thread=threading.current_thread().name,
+                wall_time=time.perf_counter() - start_wall_time,
+                cpu_time=time.thread_time() - start_cpu_time,
+                max_rss=_max_rss()
+            )
+            with self._lock:
+                self._stages.append(stage)
+
+    def count(self, name: str, amount: int = 1) -> None:
+        if not self._enabled: return
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + amount
+
+    def set_value(self, name: str, value: Any) -> None:
+        if not self._enabled: return
+        with self._lock:
+            self._values[name] = value
+
+    def report(self) -> dict[str,Any]:
+        with self._lock:
+            return {
+                "wall_time": time.perf_counter() - self._start_wall_time,
+                "cpu_time": time.process_time() - self._start_cpu_time,
+                "children_cpu_time": _children_cpu_time(),
+                "max_rss": _max_rss(),
+                "stages": [asdict(stage) for stage in self._stages],
+                "counters": dict(self._counters),
+                "values": dict(self._values),
+            }
+
+    def write_report(self, file: IO[str]) -> None:
+        json.dump(self.report(), file, indent=2)
+        file.write("\n")
+
+
+# Profiler that records nothing, used when profiling is off
+NO_PROFILER = Profiler(enabled=False)
+
+
+def _max_rss() -> int | None:
+    if resource is None: return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes, except on macOS
+    return max_rss if sys.platform == "darwin" else max_rss * 1024
+
+
+def _children_cpu_time() -> float | None:
+    # CPU time of the finished child processes (ffmpeg)
+    if resource is None: return None
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
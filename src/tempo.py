@@ -0,0 +1,173 @@
+from bisect import bisect_right
+from fractions import Fraction
+from math import floor
+
+import numpy as np
+
+from .const import DefaultValues
+
+
+# Time signatures and tempos of a song, built once, to convert between
+# master bar positions, sub-ticks, ticks and seconds:
+#   master bar position: master bar id + fraction of the master bar
+#   sub-tick:            1/tick_scale of a chart tick
+#   tick:                chart tick (resolution ticks per quarter note)
+#   seconds:             time since the start of the chart, countdown included
+class TempoMap:
+    def __init__(
+        self,
+        num_master_bars: int,
+        time_signature_data: list[tuple[int,int,int]],
+        tempo_data: list[tuple[Fraction,float]],
+        resolution: int,
+        tick_scale: int = 1,
+        start_tick: int = 0,
+        start_bpm: float = DefaultValues.SONG_BPM
+    ) -> None:
+        self._num_master_bars = num_master_bars                     # must be at least 1
+        self._resolution = resolution
+        self._tick_scale = tick_scale                               # sub-ticks per tick
+        self._start_tick = start_tick                               # tick of the first master bar
+
+        # Master bars
+        self._master_bar_numers: np.ndarray = np.empty(0)           # time signature numerator of each master bar
+        self._master_bar_denoms: np.ndarray = np.empty(0)           # time signature denominator of each master bar
+        self._master_bar_ticks: np.ndarray = np.empty(0)            # length in sub-ticks of each master bar
+        self._master_bar_start_ticks: np.ndarray = np.empty(0)      # starting sub-tick of each master bar
+        self._master_bar_end_ticks: np.ndarray = np.empty(0)        # ending sub-tick of each master bar
+        self._bar_start_ticks: list[int] = []                       # starting sub-tick of each master bar, for bisect
+
+        # Tempos, starting with the tempo of the countdown at tick 0
+        self._tempo_changes: list[tuple[int,float]] = []            # (tick, bpm) of the song, as in the chart
+        self._tempo_ticks: list[int] = [0]                          # tick of each tempo
+        self._tempo_bpms: list[float] = [start_bpm]                 # bpm of each tempo
+        self._tempo_seconds: list[float] = [0.0]                    # seconds at the tick of each tempo
+
+        self._create_master_bars(time_signature_data)
+        self._create_tempos(tempo_data)
+
+    @property
+    def num_master_bars(self) -> int:
+        return self._num_master_bars
+
+    @property
+    def master_bar_numers(self) -> np.ndarray:
+        return self._master_bar_numers
+
+    @property
+    def master_bar_denoms(self) -> np.ndarray:
+        return self._master_bar_denoms
+
+    @property
+    def master_bar_ticks(self) -> np.ndarray:
+        return self._master_bar_ticks
+
+    @property
+    def master_bar_start_ticks(self) -> np.ndarray:
+        return self._master_bar_start_ticks
+
+    @property
+    def master_bar_end_ticks(self) -> np.ndarray:
+        return self._master_bar_end_ticks
+
+    @property
+    def tempo_changes(self) -> list[tuple[int,float]]:
+        return self._tempo_changes
+
+    def sub_ticks_to_ticks(self, sub_ticks: int | Fraction) -> int:
+        # Round to the nearest tick (halfway values go to the even tick)
+        if self._tick_scale == 1 and isinstance(sub_ticks, int):
+            return sub_ticks
+        return round(Fraction(sub_ticks, self._tick_scale))
+
+    def sub_ticks_array_to_ticks(self, sub_ticks: np.ndarray) -> np.ndarray:
+        # Same rounding as sub_ticks_to_ticks, for an array of whole sub-ticks
+        if self._tick_scale == 1:
+            return sub_ticks
+        ticks, remainders = np.divmod(sub_ticks, self._tick_scale)
+        round_up = (2 * remainders > self._tick_scale) | ((2 * remainders == self._tick_scale) & (ticks % 2 == 1))
+        return ticks + round_up
+
+    def position_to_sub_ticks(self, position: Fraction | int) -> Fraction | int:
+        master_bar = floor(position)
+        if master_bar == self._num_master_bars and position == master_bar:
+            return self._bar_start_ticks[-1] + int(self._master_bar_ticks[-1])
+        if master_bar < 0 or master_bar >= self._num_master_bars:
+            raise ValueError(f"Master bar {master_bar} is out of range.")
+        return self._bar_start_ticks[master_bar] + (position - master_bar) * int(self._master_bar_ticks[master_bar])
+
+    def sub_ticks_to_position(self, sub_ticks: Fraction | int) -> Fraction:
+        # Ticks before the first master bar or after the last one are placed in them
+        master_bar = min(max(bisect_right(self._bar_start_ticks, sub_ticks) - 1, 0), self._num_master_bars - 1)
+        bar_start_ticks = self._bar_start_ticks[master_bar]
+        return master_bar + Fraction(sub_ticks - bar_start_ticks) / int(self._master_bar_ticks[master_bar])
+
+    def position_to_ticks(self, position: Fraction | int) -> int:
+        return self.sub_ticks_to_ticks(self.position_to_sub_ticks(position))
+
+    def ticks_to_position(self, ticks: Fraction | int) -> Fraction:
+        return self.sub_ticks_to_position(Fraction(ticks) * self._tick_scale)
+
+    def ticks_to_seconds(self, ticks: float) -> float:
+        # Seconds at the last tempo at or before the tick, plus the time since it
+        tempo_idx = max(bisect_right(self._tempo_ticks, ticks) - 1, 0)
+        ticks_per_second = self._tempo_bpms[tempo_idx] * self._resolution / 60
+        return self._tempo_seconds[tempo_idx] + (ticks - self._tempo_ticks[tempo_idx]) / ticks_per_second
+
+    def seconds_to_ticks(self, seconds: float) -> float:
+        # Tick of the last tempo at or before the time, plus the ticks since it
+        tempo_idx = max(bisect_right(self._tempo_seconds, seconds) - 1, 0)
+        ticks_per_second = self._tempo_bpms[tempo_idx] * self._resolution / 60
+        return self._tempo_ticks[tempo_idx] + (seconds - self._tempo_seconds[tempo_idx]) * ticks_per_second
+
+    def position_to_seconds(self, position: Fraction | int) -> float:
+        return self.ticks_to_seconds(Fraction(self.position_to_sub_ticks(position), self._tick_scale))
+
+    def seconds_to_position(self, seconds: float) -> Fraction:
+        return self.ticks_to_position(Fraction(self.seconds_to_ticks(seconds)))
+
+    def _create_master_bars(self, time_signature_data: list[tuple[int,int,int]]) -> None:
+        num_master_bars = self._num_master_bars
+
+        # Time signature of each master bar (the last change at or before it)
+        ts_bars = np.array([ts[0] for ts in time_signature_data], dtype=np.int64)
+        ts_numers = np.array([ts[1] for ts in time_signature_data], dtype=np.int64)
+        ts_denoms = np.array([ts[2] for ts in time_signature_data], dtype=np.int64)
+        ts_idx = np.searchsorted(ts_bars, np.arange(num_master_bars), side="right") - 1
+        if ts_idx[0] < 0:
+            raise ValueError("Invalid time signature (-1/-1).")
+        self._master_bar_numers = ts_numers[ts_idx]
+        self._master_bar_denoms = ts_denoms[ts_idx]
+        invalid = np.flatnonzero((self._master_bar_numers <= 0) | (self._master_bar_denoms <= 0))
+        if invalid.size:
+            ts_numer, ts_denom = self._master_bar_numers[invalid[0]], self._master_bar_denoms[invalid[0]]
+            raise ValueError(f"Invalid time signature ({ts_numer}/{ts_denom}).")
+
+        # Length of each master bar in sub-ticks
+        # (a whole note is four quarter notes of resolution ticks)
+        whole_note_sub_ticks = 4 * self._resolution * self._tick_scale
+        self._master_bar_ticks = whole_note_sub_ticks * self._master_bar_numers // self._master_bar_denoms
+
+        # Starting and ending sub-ticks of the master bars,
+        # counting from the end of the countdown
+        start_sub_tick = np.array([self._start_tick * self._tick_scale], dtype=np.int64)
+        bar_edge_ticks = np.cumsum(np.concatenate((start_sub_tick, self._master_bar_ticks)))
+        self._master_bar_start_ticks = bar_edge_ticks[:-1]
+        self._master_bar_end_ticks = bar_edge_ticks[1:]
+        self._bar_start_ticks = self._master_bar_start_ticks.tolist()
+
+    def _create_tempos(self, tempo_data: list[tuple[Fraction,float]]) -> None:
+        # Place the tempo changes inside their master bars
+        for position, bpm in tempo_data:
+            master_bar = floor(position)
+            if master_bar < 0 or master_bar >= self._num_master_bars: continue
+            if bpm <= 0: raise ValueError(f"Invalid BPM value ({bpm}).")
+            tick = self.position_to_ticks(position)
+            self._tempo_changes.append((tick, bpm))
+
+            # Seconds at the tempo change, from the tempo before it
+            # (the tempo data is sorted, so the ticks only go up)
+            seconds = self.ticks_to_seconds(tick)
+            self._tempo_ticks.append(tick)
+            self._tempo_bpms.append(bpm)
+            self._tempo_seconds.append(seconds)
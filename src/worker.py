@@ -0,0 +1,186 @@
+import argparse
+import os
+import secrets
+import signal
+import sys
+import threading
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client, Connection, Listener
+from typing import TYPE_CHECKING, Any
+
+from pathlib import Path
+
+import numpy as np
+
+from .const import DEMUCS_MODEL, SEPARATION_WORKER_ADDRESS, SEPARATION_WORKER_KEY_FILE
+
+if TYPE_CHECKING:
+    import demucs.api
+
+
+# Requests of the clients: (request, model, *arguments),
+# answered with ("ok", result) or ("error", message)
+_INFO_REQUEST = "info"              # -> (samplerate, number of channels) of the model
+_SEPARATE_REQUEST = "separate"      # (channels, samples) waveform -> stem name -> waveform
+
+
+# Connection to a separation worker, which keeps the demucs models loaded between songs
+class SeparationClient:
+    def __init__(self, connection: Connection, model: str = DEMUCS_MODEL) -> None:
+        self._connection = connection
+        self._model = model
+        self.samplerate, self.audio_channels = self._request(_INFO_REQUEST)
+
+    def __enter__(self) -> "SeparationClient":
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._connection.close()
+
+    def separate(self, wav: np.ndarray) -> dict[str,np.ndarray]:
+        return self._request(_SEPARATE_REQUEST, wav)
+
+    def _request(self, request: str, *arguments: Any) -> Any:
+        self._connection.send((request, self._model, *arguments))
+        status, result = self._connection.recv()
+        if status != "ok":
+            raise RuntimeError(f"Error: the separation worker could not separate the audio: {result}")
+        return result
+
+
+def connect_separation_worker(
+    model: str = DEMUCS_MODEL,
+    address: str = SEPARATION_WORKER_ADDRESS,
+    key_file: Path = SEPARATION_WORKER_KEY_FILE
+) -> SeparationClient | None:
+    # A running worker leaves the key that its clients authenticate with
+    try:
+        authkey = key_file.read_bytes()
+    except OSError:
+        return None
+
+    # The key may be left over from a worker that was killed
+    try:
+        connection = Client(address, authkey=authkey)
+    except (OSError, EOFError, AuthenticationError):
+        return None
+    try:
+        return SeparationClient(connection, model)
+    except (OSError, EOFError):
+        connection.close()
+        return None
+
+
+def run_separation_worker(
+    address: str = SEPARATION_WORKER_ADDRESS,
+    key_file: Path = SEPARATION_WORKER_KEY_FILE
+) -> None:
+    from .audio import create_separator
+
+    # Only one worker can listen at the address
+    client = connect_separation_worker(address=address, key_file=key_file)
+    if client is not None:
+        client.close()
+        raise RuntimeError(f"Error: a separation worker is already running at {address}.")
+    if not address.startswith("\\\\"):
+        Path(address).unlink(missing_ok=True)
+
+    # Load the models once for all clients
+    # (the default model right away, the others when they are first asked for)
+    separators = {DEMUCS_MODEL: create_separator(DEMUCS_MODEL)}
+    separate_lock = threading.Lock()
+
+    # Only the clients that can read the key can connect
+    authkey = secrets.token_bytes(32)
+    key_file.parent.mkdir(parents=True, exist_ok=True)
+    with Listener(address, authkey=authkey) as listener:
+        _write_key_file(key_file, authkey)
+        print(f"Separation worker listening at {address} (press Ctrl+C to stop)...")
+        try:
+            while True:
+                try:
+                    connection = listener.accept()
+                except (OSError, EOFError, AuthenticationError):
+                    continue
+                threading.Thread(
+                    target=_serve_client,
+                    args=(connection, separators, separate_lock),
+                    daemon=True
+                ).start()
+        finally:
+            key_file.unlink(missing_ok=True)
+
+
+def _write_key_file(key_file: Path, authkey: bytes) -> None:
+    # Readable by the user only
+    key_file.unlink(missing_ok=True)
+    fd = os.open(key_file, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with os.fdopen(fd, "wb") as file:
+        file.write(authkey)
+
+
+def _serve_client(
+    connection: Connection,
+    separators: dict[str,"demucs.api.Separator"],
+    separate_lock: threading.Lock
+) -> None:
+    from .audio import create_separator
+    import torch
+
+    with connection:
+        while True:
+            try:
+                request, model, *arguments = connection.recv()
+            except (OSError, EOFError):
+                return
+
+            try:
+                with separate_lock:
+                    if model not in separators:
+                        separators[model] = create_separator(model)
+                    separator = separators[model]
+
+                if request == _INFO_REQUEST:
+                    result = (separator.samplerate, separator.audio_channels)
+                elif request == _SEPARATE_REQUEST:
+                    # Separate one song at a time
+                    wav, = arguments
+                    with separate_lock:
+                        _, separated = separator.separate_tensor(torch.from_numpy(wav), separator.samplerate)
+                    result = {str(stem): stem_wav.cpu().numpy() for stem, stem_wav in separated.items()}
+                else:
+                    raise ValueError(f"Unknown request ({request}).")
+            except Exception as error:
+                answer = ("error", str(error))
+            else:
+                answer = ("ok", result)
+
+            try:
+                connection.send(answer)
+            except (OSError, EOFError):
+                return
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Keep the demucs model loaded and separate the audio of the conversions that run meanwhile."
+    )
+    parser.parse_args()
+
+    # Stop like on Ctrl+C when running as a service
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+
+    try:
+        run_separation_worker()
+    except KeyboardInterrupt:
+        pass
+    except RuntimeError as error:
+        print(error, file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
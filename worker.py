@@ -0,0 +1,5 @@
+from src.worker import main
+
+
+if __name__ == "__main__":
+    main()